@@ -0,0 +1,242 @@
+# anomaly.py
+"""Streaming anomaly detection on call volume.
+
+Recorded calls are counted per fixed interval of arrival time (default five
+minutes) for the total volume, each outcome and each agent. Counting is O(1)
+per call; when an interval ends, every series is compared with its baseline
+and the baseline is updated, so evaluation never rescans history.
+
+Baselines are exponentially weighted moving averages of the count and its
+variance, one per series and hour of day, so the daily cycle of a call
+centre is expected rather than flagged. An interval is anomalous when its
+count is more than `threshold` standard deviations and at least `min_delta`
+calls away from the expected count, which flags both spikes (a burst of
+dropped calls) and drops (a volume collapse). The standard deviation is never
+taken below the Poisson value sqrt(expected), so quiet series do not alert on
+single calls. A series is only judged once its baseline for that hour has
+`min_samples` intervals behind it, either live or from warm().
+
+An anomaly is reported once, when a series enters it; while it lasts its
+`intervals` grows and the baseline is frozen, so an outage does not become
+the new normal. After `max_frozen` intervals the baseline resumes learning,
+clamped to the threshold, and accepts a lasting change.
+"""
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+HOURS_PER_DAY = 24
+IDLE_AGENT_SECONDS = 7 * 86400  # agents without calls for this long are forgotten
+
+
+class _Baseline:
+    """EWMA of a per-interval count and of its variance"""
+
+    __slots__ = ("mean", "var", "n")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+
+    def update(self, value, alpha):
+        if not self.n:
+            self.mean = float(value)
+        else:
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        self.n += 1
+
+
+class _Series:
+    __slots__ = ("hours", "anomaly", "last_seen")
+
+    def __init__(self, last_seen):
+        self.hours = [_Baseline() for _ in range(HOURS_PER_DAY)]
+        self.anomaly = None  # the anomaly in progress, if any
+        self.last_seen = last_seen
+
+
+class AnomalyDetector:
+    """Thread-safe detector fed with (call_outcome, agent_id) pairs as calls
+    are recorded. Intervals are closed by the first observe() or tick() after
+    they end; tick() should run every few seconds so quiet periods (when no
+    calls arrive at all) are evaluated too. `listener`, if set, is called with
+    each new anomaly."""
+
+    def __init__(self, interval=300, threshold=4.0, min_delta=5, alpha=0.05,
+                 min_samples=36, max_frozen=12, history=500, clock=time.time):
+        if not 60 <= interval <= 3600:
+            raise ValueError("interval must be between 60 and 3600 seconds")
+        self.interval = interval
+        self.threshold = threshold
+        self.min_delta = min_delta
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_frozen = max_frozen
+        self.clock = clock
+        self.listener = None
+
+        self._lock = threading.Lock()
+        self._series = {}
+        self._counts = {}
+        self._current = self._interval_start(clock())
+        self._anomalies = deque(maxlen=history)
+        self._next_id = 1
+        self.observed = 0
+        self.intervals_closed = 0
+        self.anomalies_detected = 0
+
+    def _interval_start(self, ts):
+        ts = int(ts)
+        return ts - ts % self.interval
+
+    def observe(self, calls, now=None):
+        """Count recorded calls given as (call_outcome, agent_id) pairs"""
+        with self._lock:
+            found = self._advance(self.clock() if now is None else now)
+            counts = self._counts
+            for outcome, agent_id in calls:
+                counts[("total", "all")] = counts.get(("total", "all"), 0) + 1
+                counts[("outcome", outcome)] = counts.get(("outcome", outcome), 0) + 1
+                counts[("agent", agent_id)] = counts.get(("agent", agent_id), 0) + 1
+                self.observed += 1
+        self._notify(found)
+
+    def tick(self, now=None):
+        """Close the intervals that have ended; returns the anomalies they raised"""
+        with self._lock:
+            found = self._advance(self.clock() if now is None else now)
+        self._notify(found)
+        return found
+
+    def warm(self, hourly_counts, start, end):
+        """Seed baselines from history instead of waiting days for them to form.
+
+        hourly_counts yields (hour, dimension, value, count) for the hours in
+        [start, end); hours missing for a series count as zero. Each hour is
+        applied as the per-interval average of its count, once per interval.
+        """
+        counts = {}
+        for hour, dimension, value, count in hourly_counts:
+            counts[(dimension, value, hour)] = counts.get((dimension, value, hour), 0) + count
+        with self._lock:
+            for dimension, value, hour in counts:
+                series = self._series.setdefault((dimension, value), _Series(hour))
+                series.last_seen = max(series.last_seen, hour)
+            scale = self.interval / 3600
+            for hour in range(start - start % 3600, end, 3600):
+                slot = time.localtime(hour).tm_hour
+                for (dimension, value), series in self._series.items():
+                    average = counts.get((dimension, value, hour), 0) * scale
+                    baseline = series.hours[slot]
+                    for _ in range(3600 // self.interval):
+                        baseline.update(average, self.alpha)
+
+    def _advance(self, now):
+        found = []
+        interval = self._interval_start(now)
+        if interval - self._current > 86400:
+            # Long outage of the process itself: evaluate the open interval
+            # but do not fold a day of empty intervals into the baselines
+            found.extend(self._close(self._current))
+            self._current = interval
+        while self._current < interval:
+            found.extend(self._close(self._current))
+            self._current += self.interval
+        return found
+
+    def _close(self, start):
+        counts, self._counts = self._counts, {}
+        for key in counts:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(start)
+            series.last_seen = start
+        self.intervals_closed += 1
+
+        slot = time.localtime(start).tm_hour
+        found = []
+        idle = []
+        for key, series in self._series.items():
+            observed = counts.get(key, 0)
+            if key[0] == "agent" and start - series.last_seen > IDLE_AGENT_SECONDS:
+                idle.append(key)
+            baseline = series.hours[slot]
+            if baseline.n < self.min_samples:
+                baseline.update(observed, self.alpha)
+                series.anomaly = None
+                continue
+
+            expected = baseline.mean
+            std = math.sqrt(max(baseline.var, expected, 1.0))
+            z_score = (observed - expected) / std
+            if abs(z_score) < self.threshold or abs(observed - expected) < self.min_delta:
+                series.anomaly = None
+                baseline.update(observed, self.alpha)
+            else:
+                kind = "spike" if observed > expected else "drop"
+                anomaly = series.anomaly
+                if anomaly is None or anomaly["kind"] != kind:
+                    anomaly = series.anomaly = self._record(start, key, kind, observed, expected, z_score)
+                    found.append(anomaly)
+                else:
+                    anomaly["intervals"] += 1
+                    anomaly["interval_end"] = datetime.fromtimestamp(start + self.interval).isoformat()
+                if anomaly["intervals"] > self.max_frozen:
+                    limit = self.threshold * std
+                    baseline.update(min(max(observed, expected - limit), expected + limit), self.alpha)
+
+        # Agents that have gone quiet for good stop costing anything per interval
+        for key in idle:
+            del self._series[key]
+        return found
+
+    def _record(self, start, key, kind, observed, expected, z_score):
+        anomaly = {
+            "id": self._next_id,
+            "detected_at": datetime.fromtimestamp(self.clock()).isoformat(timespec="seconds"),
+            "interval_start": datetime.fromtimestamp(start).isoformat(),
+            "interval_end": datetime.fromtimestamp(start + self.interval).isoformat(),
+            "dimension": key[0],
+            "value": key[1],
+            "kind": kind,
+            "observed": observed,
+            "expected": round(expected, 1),
+            "z_score": round(z_score, 1),
+            "intervals": 1,
+        }
+        self._next_id += 1
+        self.anomalies_detected += 1
+        self._anomalies.append(anomaly)
+        return anomaly
+
+    def _notify(self, found):
+        if self.listener:
+            for anomaly in found:
+                self.listener(anomaly)
+
+    def recent(self, since_id=0, limit=100, dimension=None):
+        """Newest-first anomalies with id > since_id"""
+        with self._lock:
+            anomalies = list(self._anomalies)
+        return [
+            anomaly for anomaly in reversed(anomalies)
+            if anomaly["id"] > since_id and (dimension is None or anomaly["dimension"] == dimension)
+        ][:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "threshold": self.threshold,
+                "series": len(self._series),
+                "current_interval_start": datetime.fromtimestamp(self._current).isoformat(),
+                "current_interval_calls": self._counts.get(("total", "all"), 0),
+                "calls_observed": self.observed,
+                "intervals_closed": self.intervals_closed,
+                "anomalies_detected": self.anomalies_detected,
+            }
@@ -0,0 +1,101 @@
+# bench_concurrency.py - latency of GET / while /api/metrics is saturated
+#
+# Database work runs on a bounded executor, so health checks and other cheap
+# requests should keep a flat p99 while heavy metrics queries queue up.
+#
+# Usage (from the Call-System directory):
+#   python benchmarks/bench_concurrency.py --rows 1000000 --clients 16
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import import_call_api, percentile, remove_db, run_server, seed_calls
+
+
+def seed_database(db_path, rows):
+    main = import_call_api(db_path)
+
+    main.init_db()
+    with main.get_db() as conn:
+        seed_calls(conn, rows, days=7)
+    main.db_pool.close()
+
+
+def probe_root(base_url, seconds):
+    """Sequential GET / latencies (ms) for the given duration"""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            session.get(base_url + "/").raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+    return latencies
+
+
+def hammer_metrics(base_url, stop, completed):
+    with requests.Session() as session:
+        while not stop.is_set():
+            session.get(base_url + "/api/metrics", params={"start_date": "2000-01-01T00:00:00"})
+            completed.append(1)
+
+
+def summarize(label, latencies):
+    print(f"{label:<22}{len(latencies):>8}{percentile(latencies, 50):>10.1f}"
+          f"{percentile(latencies, 95):>10.1f}{percentile(latencies, 99):>10.1f}"
+          f"{max(latencies):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GET / latency under /api/metrics load")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="calls to seed")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent /api/metrics clients")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each phase")
+    parser.add_argument("--db", help="existing database to use instead of seeding one")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_concurrency.db")
+    if not args.db:
+        print(f"Seeding {args.rows:,} calls...")
+        seed_database(db_path, args.rows)
+
+    # Raw scans make every metrics request expensive enough to saturate the workers
+    try:
+        with run_server(db_path, env={"CALL_METRICS_USE_ROLLUPS": "0"}) as base_url:
+            idle = probe_root(base_url, args.seconds)
+
+            stop = threading.Event()
+            completed = []
+            workers = [
+                threading.Thread(target=hammer_metrics, args=(base_url, stop, completed))
+                for _ in range(args.clients)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            time.sleep(1)
+            loaded = probe_root(base_url, args.seconds)
+            stop.set()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+    finally:
+        if not args.db:
+            remove_db(db_path)
+
+    print(f"\nGET / latency (ms), {args.clients} clients on /api/metrics "
+          f"({len(completed) / elapsed:.1f} metrics req/s)")
+    print(f"{'phase':<22}{'requests':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    summarize("idle", idle)
+    summarize("metrics saturated", loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench_ingest.py - single-row POST /api/calls vs. POST /api/calls/batch
+#
+# Also runs single-row posts from concurrent clients with and without the
+# group-commit writer (CALL_METRICS_GROUP_COMMIT=1).
+#
+# Usage (from the Call-System directory):
+#   python benchmarks/bench_ingest.py --calls 5000 --clients 16
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import remove_db, run_server
+
+
+def make_calls(count, seed=42):
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1, 9)
+    calls = []
+    for _ in range(count):
+        start = base + timedelta(seconds=rng.randint(0, 86400 * 7))
+        end = start + timedelta(seconds=rng.randint(30, 1200))
+        calls.append({
+            "agent_id": f"AGT{rng.randint(1, 10):03d}",
+            "customer_id": f"CUST{rng.randint(1000, 9999)}",
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat(),
+            "call_outcome": rng.choice(["resolved", "escalated", "dropped", "voicemail", "callback"]),
+        })
+    return calls
+
+
+def bench_single(session, base_url, calls):
+    started = time.perf_counter()
+    for call in calls:
+        session.post(f"{base_url}/api/calls", json=call).raise_for_status()
+    return time.perf_counter() - started
+
+
+def bench_concurrent(base_url, calls, clients):
+    """Single-row posts split across `clients` threads, one session each"""
+    def post_all(chunk):
+        with requests.Session() as session:
+            for call in chunk:
+                session.post(f"{base_url}/api/calls", json=call).raise_for_status()
+
+    chunks = [calls[i::clients] for i in range(clients)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(post_all, chunks))
+    return time.perf_counter() - started
+
+
+def bench_batch_json(session, base_url, calls, batch_size):
+    started = time.perf_counter()
+    for offset in range(0, len(calls), batch_size):
+        response = session.post(f"{base_url}/api/calls/batch", json=calls[offset:offset + batch_size])
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def bench_batch_ndjson(session, base_url, calls):
+    def body():
+        for call in calls:
+            yield (json.dumps(call) + "\n").encode()
+
+    started = time.perf_counter()
+    response = session.post(
+        f"{base_url}/api/calls/batch",
+        data=body(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-row and batch call ingestion")
+    parser.add_argument("--calls", type=int, default=2000, help="records per run")
+    parser.add_argument("--batch-size", type=int, default=1000, help="records per JSON batch request")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients for single-row posts")
+    parser.add_argument("--synchronous", default="NORMAL",
+                        help="SQLite synchronous mode for the server (FULL fsyncs every commit)")
+    args = parser.parse_args()
+    env = {"CALL_METRICS_DB_SYNCHRONOUS": args.synchronous}
+
+    calls = make_calls(args.calls)
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_ingest.db")
+    results = {}
+    try:
+        with run_server(db_path, env=env) as base_url, requests.Session() as session:
+            results["single"] = bench_single(session, base_url, calls)
+            results["batch_json"] = bench_batch_json(session, base_url, calls, args.batch_size)
+            results["batch_ndjson"] = bench_batch_ndjson(session, base_url, calls)
+            results[f"single_x{args.clients}"] = bench_concurrent(base_url, calls, args.clients)
+        with run_server(db_path, env={**env, "CALL_METRICS_GROUP_COMMIT": "1"}) as base_url:
+            results[f"group_x{args.clients}"] = bench_concurrent(base_url, calls, args.clients)
+            ingest = requests.get(f"{base_url}/api/system/ingest").json()
+    finally:
+        remove_db(db_path)
+
+    print(f"{'path':<14}{'seconds':>10}{'calls/s':>12}{'speedup':>10}")
+    for name, seconds in results.items():
+        print(f"{name:<14}{seconds:>10.2f}{args.calls / seconds:>12.0f}"
+              f"{results['single'] / seconds:>9.1f}x")
+    print(f"group commit: {ingest['batches']} batches, "
+          f"avg {ingest['avg_batch_size']} calls, max {ingest['max_batch_size']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_list.py - GET /api/calls rows/sec, default vs. ?fast=true serialization
+#
+# Walks the newest pages of GET /api/calls with limit=1000 over HTTP, once
+# through the default response_model path and once with fast=true, and
+# reports rows/sec for each.
+#
+# Usage (from the Call-System directory):
+#   python benchmarks/bench_list.py --rows 200000 --pages 50
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    from json import loads
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import import_call_api, remove_db, run_server, seed_calls
+
+
+def seed_database(db_path, rows):
+    main = import_call_api(db_path)
+
+    main.init_db()
+    with main.get_db() as conn:
+        seed_calls(conn, rows, days=7)
+    main.db_pool.close()
+
+
+def walk_pages(session, base_url, pages, limit, fast):
+    """Fetch `pages` consecutive pages and return (rows, seconds)"""
+    params = {"limit": limit}
+    if fast:
+        params["fast"] = "true"
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(pages):
+        response = session.get(f"{base_url}/api/calls", params=params)
+        response.raise_for_status()
+        page = loads(response.content)
+        rows += len(page["calls"])
+        if not page["next_cursor"]:
+            break
+        params["cursor"] = page["next_cursor"]
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GET /api/calls serialization")
+    parser.add_argument("--rows", type=int, default=200_000, help="calls to seed")
+    parser.add_argument("--pages", type=int, default=50, help="pages to walk per mode")
+    parser.add_argument("--limit", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=3, help="walks per mode (best is kept)")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_list.db")
+    try:
+        seed_database(db_path, args.rows)
+        with run_server(db_path) as base_url, requests.Session() as session:
+            # Warm the page cache and the server's connections
+            walk_pages(session, base_url, args.pages, args.limit, fast=False)
+
+            print(f"{args.pages} pages x {args.limit} rows, best of {args.repeat}")
+            results = {}
+            for label, fast in (("default", False), ("fast=true", True)):
+                best = None
+                for _ in range(args.repeat):
+                    rows, seconds = walk_pages(session, base_url, args.pages, args.limit, fast)
+                    rate = rows / seconds
+                    best = rate if best is None else max(best, rate)
+                results[label] = best
+                print(f"{label:<10} {best:>12,.0f} rows/s")
+            print(f"speedup    {results['fast=true'] / results['default']:>12.2f}x")
+    finally:
+        remove_db(db_path)
+
+
+if __name__ == "__main__":
+    main()
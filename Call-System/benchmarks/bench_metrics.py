@@ -0,0 +1,101 @@
+# bench_metrics.py - /api/metrics query engines at production-sized data
+#
+# Compares the original four-query implementation with the single-scan raw
+# engine and the rollup engine in main.compute_metrics, and times the
+# /api/metrics/concurrency sweep (main.compute_concurrency) over the same windows.
+#
+# Usage (from the Call-System directory):
+#   python benchmarks/bench_metrics.py --rows 1000000
+#   python benchmarks/bench_metrics.py --rows 2000000 --agents 100
+#   python benchmarks/bench_metrics.py --rows 10000000 --db /tmp/calls_10m.db --keep
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+from common import import_call_api, remove_db, seed_calls
+
+
+def legacy_metrics(conn, start_date, end_date):
+    """The four range scans get_metrics used to run, on the current schema"""
+    import main
+
+    params = (main._to_epoch_ceil(start_date), main._to_epoch(end_date))
+    conn.execute(
+        "SELECT COUNT(*), AVG(duration) FROM calls WHERE start_time >= ? AND start_time <= ?",
+        params).fetchall()
+    conn.execute(
+        "SELECT outcome_key, COUNT(*) FROM calls WHERE start_time >= ? AND start_time <= ? "
+        "GROUP BY outcome_key", params).fetchall()
+    conn.execute(
+        "SELECT start_time - start_time % 3600 as hour, COUNT(*) FROM calls "
+        "WHERE start_time >= ? AND start_time <= ? GROUP BY hour ORDER BY hour", params).fetchall()
+    conn.execute(
+        "SELECT agent_key, COUNT(*) as call_count, AVG(duration) FROM calls "
+        "WHERE start_time >= ? AND start_time <= ? GROUP BY agent_key "
+        "ORDER BY call_count DESC LIMIT 5", params).fetchall()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/metrics query engines")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="calls to seed")
+    parser.add_argument("--days", type=int, default=30, help="days the calls are spread over")
+    parser.add_argument("--agents", type=int, default=50, help="agents the calls are spread over")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--db", help="database file to use (seeded only if it does not exist)")
+    parser.add_argument("--keep", action="store_true", help="keep the database afterwards")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_metrics.db")
+    main = import_call_api(db_path)
+
+    seed = not os.path.exists(db_path)
+    main.init_db()
+    try:
+        with main.get_db() as conn:
+            if seed:
+                print(f"Seeding {args.rows:,} calls over {args.days} days for {args.agents} agents...")
+                started = time.perf_counter()
+                seed_calls(conn, args.rows, days=args.days, agents=args.agents)
+                print(f"Seeded in {time.perf_counter() - started:.1f}s")
+            total = conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+            agents = conn.execute("SELECT COUNT(*) FROM agents").fetchone()[0]
+
+            now = datetime.now()
+            windows = [("1h", timedelta(hours=1)), ("24h", timedelta(hours=24)),
+                       ("7d", timedelta(days=7)), ("30d", timedelta(days=30))]
+            engines = [
+                ("four-query", lambda s, e: legacy_metrics(conn, s, e)),
+                ("single-scan", lambda s, e: main.compute_metrics(conn, s, e, use_rollups=False)),
+                ("rollup", lambda s, e: main.compute_metrics(conn, s, e, use_rollups=True)),
+                ("concurrency", lambda s, e: main.compute_concurrency(conn, s, e, "1h")),
+            ]
+
+            print(f"\n{total:,} calls, {agents} agents, best of {args.repeat} (ms)")
+            print(f"{'window':<8}" + "".join(f"{name:>14}" for name, _ in engines))
+            for label, span in windows:
+                # Off-hour boundaries exercise the rollup engine's raw edges
+                start, end = now - span - timedelta(minutes=17), now - timedelta(minutes=17)
+                row = [best_of(lambda: fn(start, end), args.repeat) * 1000 for _, fn in engines]
+                print(f"{label:<8}" + "".join(f"{ms:>14.1f}" for ms in row))
+    finally:
+        main.db_pool.close()
+        if not args.keep:
+            remove_db(db_path)
+
+
+if __name__ == "__main__":
+    main()
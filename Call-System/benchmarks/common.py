@@ -0,0 +1,122 @@
+# common.py - helpers shared by the Call Metrics API benchmarks
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+CALL_SYSTEM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_call_api(db_path, env=None):
+    """Import the Call Metrics API module bound to db_path. main reads its
+    configuration at import time, so db_path and env only apply to the first import."""
+    os.environ.update(env or {})
+    os.environ["CALL_METRICS_DB"] = os.path.abspath(db_path)
+    if CALL_SYSTEM_DIR not in sys.path:
+        sys.path.insert(0, CALL_SYSTEM_DIR)
+    import main
+    return main
+
+
+def free_port():
+    """Ask the OS for an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(db_path, port=None, env=None, startup_timeout=60):
+    """Start the Call Metrics API with uvicorn against db_path and yield its base URL"""
+    import requests
+
+    port = port or free_port()
+    server_env = dict(os.environ, CALL_METRICS_DB=os.path.abspath(db_path))
+    server_env.update(env or {})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=CALL_SYSTEM_DIR,
+        env=server_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + startup_timeout
+        while True:
+            try:
+                requests.get(base_url + "/", timeout=1)
+                break
+            except requests.ConnectionError:
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("Call Metrics API failed to start")
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@contextmanager
+def serve_in_process(db_path, port=None, env=None, startup_timeout=60):
+    """Run the Call Metrics API with uvicorn on a thread of this process and
+    yield its base URL (db_path and env as for import_call_api)"""
+    import uvicorn
+
+    main = import_call_api(db_path, env)
+
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        main.app, host="127.0.0.1", port=port, log_level="warning",
+    ))
+    thread = threading.Thread(target=server.run, name="call-api-server", daemon=True)
+    thread.start()
+    try:
+        deadline = time.time() + startup_timeout
+        while not server.started:
+            if not thread.is_alive() or time.time() > deadline:
+                raise RuntimeError("Call Metrics API failed to start")
+            time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def remove_db(db_path):
+    """Delete a SQLite database together with its WAL and shared-memory files"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def seed_calls(conn, rows, days=30, seed=42, agents=50, batch_size=100_000, end=None):
+    """Bulk-load about `rows` synthetic calls over the `days` days before `end`
+    (epoch seconds, default now) with generate_data.py (business-hours shape,
+    rollups maintained). The same seed and end give the same calls. Returns
+    the number of calls inserted."""
+    if CALL_SYSTEM_DIR not in sys.path:
+        sys.path.insert(0, CALL_SYSTEM_DIR)
+    import main
+    from generate_data import calls_per_hour_for, generate_calls
+
+    return main.load_calls(conn, generate_calls(
+        days=days,
+        agents=agents,
+        customers=99_000,
+        calls_per_hour=calls_per_hour_for(rows, days),
+        seed=seed,
+        end=end,
+        batch_size=batch_size,
+    ))
@@ -0,0 +1,375 @@
+# load_test.py - mixed-workload HTTP load test for the Call Metrics API
+#
+# Seeds a database at the requested scale, starts the API (uvicorn in a
+# subprocess, or on a thread of this process with --in-process) and drives a
+# weighted mix of requests from --concurrency client threads for --seconds.
+# Reports throughput and p50/p95/p99 latency per endpoint, optionally writes
+# them to JSON and compares them with a stored baseline run.
+#
+# Usage (from the Call-System directory):
+#   python benchmarks/load_test.py --rows 1000000 --end 2024-03-15T18:00 --concurrency 16 --output baseline.json
+#   python benchmarks/load_test.py --rows 1000000 --end 2024-03-15T18:00 --concurrency 16 --baseline baseline.json
+#
+# The seeded calls depend on --end as well as the seed, so give the same --end
+# to runs that are compared with each other.
+#   python benchmarks/load_test.py --mix ingest=1,metrics_24h=1 --env CALL_METRICS_GROUP_COMMIT=1
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import CALL_SYSTEM_DIR, import_call_api, percentile, remove_db, run_server, seed_calls, serve_in_process
+
+sys.path.insert(0, CALL_SYSTEM_DIR)
+from generate_data import parse_end
+
+RESULT_FORMAT = 1
+OUTCOMES = ["resolved", "escalated", "dropped", "voicemail", "callback"]
+
+
+class Workload:
+    """Builds one request for each operation of the mix"""
+
+    def __init__(self, base_url, agents, customers, batch_size, metrics_jitter, anchor=None):
+        self.base_url = base_url
+        self.agents = agents
+        self.customers = customers
+        self.batch_size = batch_size
+        self.metrics_jitter = metrics_jitter
+        # Metrics windows end at a fixed instant (the end of the seeded data,
+        # or now) minus a random jitter, so --metrics-jitter 0 measures cached
+        # responses and larger values misses
+        self.anchor = datetime.fromtimestamp(anchor) if anchor else datetime.now().replace(microsecond=0)
+
+    def _call(self, rng):
+        start = datetime.now() - timedelta(seconds=rng.randint(0, 600))
+        return {
+            "agent_id": f"AGT{rng.randint(1, self.agents):03d}",
+            "customer_id": f"CUST{rng.randint(1000, 999 + self.customers)}",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(seconds=rng.randint(30, 1200))).isoformat(),
+            "call_outcome": rng.choice(OUTCOMES),
+        }
+
+    def _metrics(self, session, rng, hours):
+        end = self.anchor - timedelta(seconds=rng.randint(0, self.metrics_jitter))
+        return session.get(self.base_url + "/api/metrics", params={
+            "start_date": (end - timedelta(hours=hours)).isoformat(),
+            "end_date": end.isoformat(),
+        })
+
+    def ingest(self, session, rng):
+        return session.post(self.base_url + "/api/calls", json=self._call(rng))
+
+    def ingest_batch(self, session, rng):
+        calls = [self._call(rng) for _ in range(self.batch_size)]
+        return session.post(self.base_url + "/api/calls/batch", json=calls)
+
+    def list(self, session, rng):
+        params = {"limit": 100}
+        if rng.random() < 0.5:
+            params["agent_id"] = f"AGT{rng.randint(1, self.agents):03d}"
+        return session.get(self.base_url + "/api/calls", params=params)
+
+    def metrics_1h(self, session, rng):
+        return self._metrics(session, rng, 1)
+
+    def metrics_24h(self, session, rng):
+        return self._metrics(session, rng, 24)
+
+    def metrics_7d(self, session, rng):
+        return self._metrics(session, rng, 24 * 7)
+
+    def agents_list(self, session, rng):
+        return session.get(self.base_url + "/api/agents")
+
+
+# Operation name -> (Workload method, label in reports)
+OPERATIONS = {
+    "ingest": ("ingest", "POST /api/calls"),
+    "ingest_batch": ("ingest_batch", "POST /api/calls/batch"),
+    "list": ("list", "GET /api/calls"),
+    "metrics_1h": ("metrics_1h", "GET /api/metrics 1h"),
+    "metrics_24h": ("metrics_24h", "GET /api/metrics 24h"),
+    "metrics_7d": ("metrics_7d", "GET /api/metrics 7d"),
+    "agents": ("agents_list", "GET /api/agents"),
+}
+DEFAULT_MIX = "ingest=4,ingest_batch=1,list=4,metrics_1h=2,metrics_24h=2,metrics_7d=1,agents=2"
+
+
+def parse_mix(text):
+    """Parse "name=weight,..." into {name: weight}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {name}: {weight!r}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def parse_env(items):
+    env = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--env expects NAME=VALUE, got {item!r}")
+        env[name] = value
+    return env
+
+
+def client(workload, mix, seed, stop, samples):
+    """Issue requests until stop is set, appending (operation, ms, ok) to samples"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    local = []
+    with requests.Session() as session:
+        while not stop.is_set():
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(workload, OPERATIONS[name][0])(session, rng).ok
+            except requests.RequestException:
+                ok = False
+            local.append((name, (time.perf_counter() - started) * 1000, ok))
+    samples.extend(local)
+
+
+def run_phase(workload, mix, concurrency, seconds, seed):
+    """Drive the mix for `seconds` and return (samples, elapsed seconds)"""
+    stop = threading.Event()
+    samples = []
+    threads = [
+        threading.Thread(target=client, args=(workload, mix, seed + i, stop, samples))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    def stats(latencies, errors):
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies, default=0.0), 2),
+        }
+
+    latencies = {}
+    errors = {}
+    for name, ms, ok in samples:
+        latencies.setdefault(name, []).append(ms)
+        errors[name] = errors.get(name, 0) + (not ok)
+    results = {name: stats(latencies[name], errors[name]) for name in sorted(latencies)}
+    total = stats([ms for _, ms, _ in samples], sum(not ok for _, _, ok in samples))
+    return results, total
+
+
+def print_results(results, total):
+    print(f"\n{'endpoint':<24}{'requests':>9}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, row in list(results.items()) + [("total", total)]:
+        label = OPERATIONS[name][1] if name in OPERATIONS else name
+        print(f"{label:<24}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+
+
+def compare(run, baseline, tolerance):
+    """Print per-endpoint changes against a baseline run and return the
+    regressions (throughput down or p95/p99 up by more than tolerance %)"""
+    for key in ("rows", "end", "concurrency", "mix", "server"):
+        if run["config"].get(key) != baseline["config"].get(key):
+            print(f"warning: {key} differs from the baseline "
+                  f"({baseline['config'].get(key)!r} -> {run['config'].get(key)!r})")
+
+    def change(new, old):
+        return (new - old) / old * 100 if old else 0.0
+
+    regressions = []
+    print(f"\nvs. baseline from {baseline.get('timestamp', '?')} ({baseline.get('git_commit') or 'unknown commit'})")
+    print(f"{'endpoint':<24}{'req/s':>16}{'p95 ms':>16}{'p99 ms':>16}")
+    rows = dict(run["results"], total=run["total"])
+    old_rows = dict(baseline["results"], total=baseline["total"])
+    for name, row in rows.items():
+        old = old_rows.get(name)
+        if old is None:
+            continue
+        deltas = {
+            "throughput_rps": change(row["throughput_rps"], old["throughput_rps"]),
+            "p95_ms": change(row["p95_ms"], old["p95_ms"]),
+            "p99_ms": change(row["p99_ms"], old["p99_ms"]),
+        }
+        label = OPERATIONS[name][1] if name in OPERATIONS else name
+        print(f"{label:<24}" + "".join(
+            f"{row[metric]:>9.1f}{delta:>+6.0f}%" for metric, delta in deltas.items()))
+        if deltas["throughput_rps"] < -tolerance:
+            regressions.append(f"{label}: throughput {deltas['throughput_rps']:+.0f}%")
+        for metric in ("p95_ms", "p99_ms"):
+            if deltas[metric] > tolerance:
+                regressions.append(f"{label}: {metric[:3]} {deltas[metric]:+.0f}%")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=CALL_SYSTEM_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_database(db_path, rows, days, agents, end, env):
+    # With --in-process the server shares this import, so it gets the server environment
+    main = import_call_api(db_path, env)
+
+    main.init_db()
+    with main.get_db() as conn:
+        inserted = seed_calls(conn, rows, days=days, agents=agents, end=end)
+    main.db_pool.close()
+    return inserted
+
+
+def count_calls(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-workload load test for the Call Metrics API")
+    parser.add_argument("--rows", type=int, default=200_000, help="calls to seed")
+    parser.add_argument("--days", type=int, default=7, help="days of history to seed")
+    parser.add_argument("--end", type=parse_end,
+                        help="end of the seeded history, epoch seconds or ISO datetime (default: now)")
+    parser.add_argument("--agents", type=int, default=50, help="agents to seed and ingest for")
+    parser.add_argument("--db", help="database to use; seeded first if it does not exist")
+    parser.add_argument("--keep-db", action="store_true", help="keep the seeded temporary database")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run the API on a thread of this process instead of a uvicorn subprocess")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="server environment variable, e.g. CALL_METRICS_GROUP_COMMIT=1 (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--seconds", type=float, default=30, help="measured duration")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured warm-up duration")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--batch-size", type=int, default=100, help="calls per ingest_batch request")
+    parser.add_argument("--metrics-jitter", type=int, default=3600,
+                        help="seconds by which metrics windows vary (0: repeat one window, mostly cache hits)")
+    parser.add_argument("--seed", type=int, default=42, help="client random seed")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results from an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=10,
+                        help="percent change counted as a regression against the baseline")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit with status 1 if any endpoint regressed")
+    args = parser.parse_args()
+    env = parse_env(args.env)
+
+    temporary = not args.db
+    db_path = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(), "load_test.db"))
+    end = None
+    try:
+        if os.path.exists(db_path):
+            seeded = count_calls(db_path)
+            print(f"Using {db_path} ({seeded:,} calls)")
+        else:
+            end = args.end or int(time.time())
+            print(f"Seeding ~{args.rows:,} calls over the {args.days} days to "
+                  f"{datetime.fromtimestamp(end).isoformat()} into {db_path}...")
+            started = time.perf_counter()
+            seeded = seed_database(db_path, args.rows, args.days, args.agents, end, env)
+            print(f"Seeded {seeded:,} calls in {time.perf_counter() - started:.1f}s")
+
+        server = serve_in_process if args.in_process else run_server
+        with server(db_path, env=env) as base_url:
+            workload = Workload(base_url, args.agents, 99_000, args.batch_size, args.metrics_jitter,
+                                anchor=end)
+            if args.warmup:
+                run_phase(workload, args.mix, args.concurrency, args.warmup, args.seed)
+            print(f"Running {args.concurrency} clients for {args.seconds:g}s...")
+            samples, elapsed = run_phase(workload, args.mix, args.concurrency, args.seconds,
+                                         args.seed + args.concurrency)
+    finally:
+        if temporary and not args.keep_db:
+            remove_db(db_path)
+
+    results, total = summarize(samples, elapsed)
+    print_results(results, total)
+
+    run = {
+        "format": RESULT_FORMAT,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": {
+            "rows": args.rows if temporary else None,
+            "seeded_rows": seeded,
+            "days": args.days,
+            "end": end,  # epoch seconds the seeded calls end at
+            "agents": args.agents,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "warmup": args.warmup,
+            "mix": args.mix,
+            "batch_size": args.batch_size,
+            "metrics_jitter": args.metrics_jitter,
+            "server": "in-process" if args.in_process else "uvicorn",
+            "env": env,
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "results": results,
+        "total": total,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(run, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:g}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print(f"\nNo regressions beyond {args.tolerance:g}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,9 @@ st.markdown("""
 
 # API configuration
 API_BASE_URL = "http://localhost:8000"
+STREAM_MAX_WAIT = 60        # seconds to wait for a pushed update before refreshing anyway
+STREAM_SETTLE_SECONDS = 1
+BUCKET_NAMES = {"5m": "5 Minutes", "15m": "15 Minutes", "1h": "Hour", "1d": "Day"}
 
 # Initialize session state for auto-refresh
 if 'auto_refresh' not in st.session_state:
@@ -73,18 +76,16 @@ with st.sidebar:
         agents_response = requests.get(f"{API_BASE_URL}/api/agents")
         if agents_response.status_code == 200:
             agents = [agent['agent_id'] for agent in agents_response.json()]
-            agent_filter = st.selectbox(
-                "Filter by Agent",
-                options=["All Agents"] + agents
-            )
+            # Empty selection means all agents; the filter is applied by the API
+            agent_filter = st.multiselect("Filter by Agents", options=agents)
         else:
-            agent_filter = "All Agents"
+            agent_filter = []
     except:
-        agent_filter = "All Agents"
+        agent_filter = []
         st.error("Could not load agents list")
     
     # Auto-refresh toggle
-    auto_refresh = st.checkbox("Auto-refresh (30s)", value=st.session_state.auto_refresh)
+    auto_refresh = st.checkbox("Live updates", value=st.session_state.auto_refresh)
     st.session_state.auto_refresh = auto_refresh
     
     # Manual refresh button
@@ -93,12 +94,15 @@ with st.sidebar:
 
 # Function to fetch metrics from API
 @st.cache_data(ttl=30)
-def fetch_metrics(start_dt, end_dt):
+def fetch_metrics(start_dt, end_dt, agent_ids=()):
     try:
         params = {
             "start_date": start_dt.isoformat(),
-            "end_date": end_dt.isoformat()
+            "end_date": end_dt.isoformat(),
+            "bucket": "auto"
         }
+        if agent_ids:
+            params["agent_id"] = list(agent_ids)
         response = requests.get(f"{API_BASE_URL}/api/metrics", params=params)
         if response.status_code == 200:
             return response.json()
@@ -109,8 +113,28 @@ def fetch_metrics(start_dt, end_dt):
         st.error(f"Failed to connect to API: {str(e)}")
         return None
 
+def fetch_anomalies():
+    try:
+        response = requests.get(f"{API_BASE_URL}/api/anomalies", params={"limit": 20}, timeout=5)
+        if response.status_code == 200:
+            return response.json()['anomalies']
+    except Exception:
+        pass
+    return []
+
 # Fetch data
-metrics = fetch_metrics(start_datetime, end_datetime)
+metrics = fetch_metrics(start_datetime, end_datetime, tuple(agent_filter))
+
+# Volume anomalies still in progress or detected within the last hour
+recent_cutoff = (datetime.now() - timedelta(hours=1)).isoformat()
+for anomaly in fetch_anomalies():
+    if anomaly['interval_end'] >= recent_cutoff:
+        subject = "Total call volume" if anomaly['dimension'] == 'total' else \
+            f"{anomaly['dimension'].title()} {anomaly['value']}"
+        st.warning(
+            f"⚠️ {subject}: {anomaly['kind']} since {anomaly['interval_start'][11:16]} — "
+            f"{anomaly['observed']} calls per interval vs. {anomaly['expected']} expected"
+        )
 
 if metrics:
     # Key Metrics Row
@@ -130,6 +154,11 @@ if metrics:
             value=f"{avg_duration_minutes:.1f} min",
             delta=None
         )
+        percentiles = metrics.get('duration_percentiles') or {}
+        if percentiles:
+            st.caption(" · ".join(
+                f"{name} {value / 60:.1f} min" for name, value in percentiles.items()
+            ))
     
     with col3:
         resolved_calls = metrics['calls_by_outcome'].get('resolved', 0)
@@ -141,23 +170,24 @@ if metrics:
         )
     
     with col4:
-        # Find peak hour
+        # Find peak hour (or day, for long ranges bucketed by day)
+        daily = metrics.get('bucket') == '1d'
         if metrics['calls_per_hour']:
             peak_hour_data = max(metrics['calls_per_hour'], key=lambda x: x['count'])
-            peak_hour = datetime.fromisoformat(peak_hour_data['hour']).strftime("%I %p")
+            peak_hour = datetime.fromisoformat(peak_hour_data['hour']).strftime("%b %d" if daily else "%I:%M %p")
             st.metric(
-                label="📈 Peak Hour",
+                label="📈 Peak Day" if daily else "📈 Peak Hour",
                 value=peak_hour,
                 delta=f"{peak_hour_data['count']} calls"
             )
         else:
-            st.metric(label="📈 Peak Hour", value="N/A")
+            st.metric(label="📈 Peak Day" if daily else "📈 Peak Hour", value="N/A")
     
     # Charts Row
     col1, col2 = st.columns(2)
     
     with col1:
-        st.subheader("📊 Calls Per Hour")
+        st.subheader(f"📊 Calls Per {BUCKET_NAMES.get(metrics.get('bucket'), 'Hour')}")
         if metrics['calls_per_hour']:
             # Prepare data for line chart
             df_hourly = pd.DataFrame(metrics['calls_per_hour'])
@@ -238,6 +268,9 @@ if metrics:
                 st.markdown(f"📞 {agent['call_count']} calls")
             with col4:
                 st.markdown(f"⏱️ {agent['avg_duration_min']:.1f} min avg")
+                p90 = (agent.get('duration_percentiles') or {}).get('p90')
+                if p90 is not None:
+                    st.caption(f"p90 {p90 / 60:.1f} min")
         
         # Bar chart for agent performance
         st.subheader("📊 Agent Call Volume")
@@ -265,18 +298,28 @@ if metrics:
     
     # Call Details Table (Optional)
     with st.expander("📋 View Recent Calls"):
+        # Keyset pagination: a stack of cursors for the pages already visited,
+        # reset whenever the filters change
+        calls_filters = (start_datetime, end_datetime, tuple(agent_filter))
+        if st.session_state.get('calls_filters') != calls_filters:
+            st.session_state.calls_filters = calls_filters
+            st.session_state.calls_cursors = [None]
+        
         try:
             params = {
                 "start_date": start_datetime.isoformat(),
                 "end_date": end_datetime.isoformat(),
                 "limit": 50
             }
-            if agent_filter != "All Agents":
+            if agent_filter:
                 params["agent_id"] = agent_filter
+            if st.session_state.calls_cursors[-1]:
+                params["cursor"] = st.session_state.calls_cursors[-1]
             
             calls_response = requests.get(f"{API_BASE_URL}/api/calls", params=params)
             if calls_response.status_code == 200:
-                calls_data = calls_response.json()
+                calls_page = calls_response.json()
+                calls_data = calls_page['calls']
                 if calls_data:
                     calls_df = pd.DataFrame(calls_data)
                     calls_df['start_time'] = pd.to_datetime(calls_df['start_time'])
@@ -292,6 +335,18 @@ if metrics:
                         use_container_width=True,
                         hide_index=True
                     )
+                    
+                    col1, col2, col3 = st.columns([1, 2, 1])
+                    with col1:
+                        if len(st.session_state.calls_cursors) > 1 and st.button("⬅️ Newer"):
+                            st.session_state.calls_cursors.pop()
+                            st.rerun()
+                    with col2:
+                        st.caption(f"Page {len(st.session_state.calls_cursors)}")
+                    with col3:
+                        if calls_page['next_cursor'] and st.button("Older ➡️"):
+                            st.session_state.calls_cursors.append(calls_page['next_cursor'])
+                            st.rerun()
                 else:
                     st.info("No calls found for the selected criteria")
         except Exception as e:
@@ -300,19 +355,45 @@ if metrics:
 else:
     st.error("Unable to load metrics. Please check if the API is running at http://localhost:8000")
 
-# Auto-refresh logic
-if st.session_state.auto_refresh:
-    time.sleep(30)
-    st.rerun()
-
 # Footer
 st.markdown("---")
 st.markdown(
     """
     <div style='text-align: center; color: #666;'>
-        Call Metrics Dashboard | Auto-refreshes every 30 seconds | 
+        Call Metrics Dashboard | Live updates from the API stream | 
         <a href='http://localhost:8000/docs' target='_blank'>API Docs</a>
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Auto-refresh logic: block on the API's live metrics stream and rerun as
+# soon as new calls land (or after STREAM_MAX_WAIT seconds of quiet)
+def wait_for_update():
+    headers = {}
+    if 'stream_event_id' in st.session_state:
+        headers['Last-Event-ID'] = st.session_state.stream_event_id
+    deadline = time.time() + STREAM_MAX_WAIT
+    try:
+        with requests.get(f"{API_BASE_URL}/api/stream/metrics", headers=headers,
+                          stream=True, timeout=(5, STREAM_MAX_WAIT)) as response:
+            response.raise_for_status()
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("id:"):
+                    st.session_state.stream_event_id = line[3:].strip()
+                elif line.startswith("event:"):
+                    event = line[6:].strip()
+                elif not line and event in ("calls", "anomaly", "resync"):
+                    # Let a burst of inserts settle before re-rendering
+                    time.sleep(STREAM_SETTLE_SECONDS)
+                    return
+                if time.time() > deadline:
+                    return
+    except requests.RequestException:
+        # Stream unavailable: fall back to polling
+        time.sleep(30)
+
+if st.session_state.auto_refresh:
+    wait_for_update()
+    st.rerun()
\ No newline at end of file
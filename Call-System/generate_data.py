@@ -0,0 +1,135 @@
+# generate_data.py
+"""Seeded synthetic call data for demos, benchmarks and load tests.
+
+Calls follow the business-hours shape of the demo data: every hour from 9 AM
+to 6 PM gets calls_per_hour calls on average (+/- a third), the remaining
+hours about a sixth of that. Durations are uniform between 30 seconds and
+20 minutes. A fixed seed reproduces the same calls for the same end time, so
+pass --end as well to regenerate a dataset exactly.
+
+Usage (from the Call-System directory):
+    python generate_data.py --days 365 --agents 200 --calls-per-hour 2200 --db /tmp/calls_10m.db --fresh
+    python generate_data.py --seed 1 --end 2024-03-15T18:00:00 --db /tmp/calls.db --fresh
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+BUSINESS_HOURS = range(9, 19)  # 9 AM - 6 PM inclusive
+OUTCOMES = ["resolved", "escalated", "dropped", "voicemail", "callback"]
+SECONDS_IN_HOUR = range(3600)
+DURATIONS = range(30, 1201)  # 30 seconds to 20 minutes
+
+
+def hourly_volume(rng, hour_of_day, calls_per_hour):
+    if hour_of_day in BUSINESS_HOURS:
+        return rng.randint(calls_per_hour * 2 // 3, calls_per_hour * 4 // 3)
+    # Averages a sixth of the business-hours volume
+    return rng.randint(0, calls_per_hour // 3)
+
+
+def expected_calls(days, calls_per_hour):
+    """Approximate number of calls generate_calls() produces"""
+    off_hours = 24 - len(BUSINESS_HOURS)
+    return round(days * calls_per_hour * (len(BUSINESS_HOURS) + off_hours / 6))
+
+
+def calls_per_hour_for(rows, days):
+    """calls_per_hour that yields roughly `rows` calls over `days` days"""
+    return max(1, round(rows / expected_calls(days, 1)))
+
+
+def parse_end(text):
+    """Epoch seconds for an --end given as epoch seconds or an ISO datetime
+    (naive datetimes are local time)"""
+    try:
+        return int(float(text))
+    except ValueError:
+        pass
+    try:
+        return int(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected epoch seconds or an ISO datetime, got {text!r}")
+
+
+def generate_calls(days=7, agents=10, customers=9000, calls_per_hour=30, seed=None,
+                   end=None, batch_size=100_000):
+    """Yield lists of (agent_id, customer_id, start_time, end_time, call_outcome)
+    tuples with epoch-second timestamps, covering the `days` days before `end`
+    (default: now) in time order."""
+    rng = random.Random(seed)
+    agent_ids = [f"AGT{i:03d}" for i in range(1, agents + 1)]
+    customer_ids = [f"CUST{i}" for i in range(1000, 1000 + customers)]
+    end = int(time.time() if end is None else end)
+    hour = end - days * 86400
+    hour -= hour % 3600
+
+    batch = []
+    while hour < end:
+        count = hourly_volume(rng, time.localtime(hour).tm_hour, calls_per_hour)
+        starts = sorted(hour + offset for offset in rng.choices(SECONDS_IN_HOUR, k=count))
+        batch.extend(
+            (agent_id, customer_id, start, start + duration, outcome)
+            for agent_id, customer_id, start, duration, outcome in zip(
+                rng.choices(agent_ids, k=count),
+                rng.choices(customer_ids, k=count),
+                starts,
+                rng.choices(DURATIONS, k=count),
+                rng.choices(OUTCOMES, k=count),
+            )
+            if start < end
+        )
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+        hour += 3600
+    if batch:
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic calls for the Call Metrics API")
+    parser.add_argument("--db", default=os.environ.get("CALL_METRICS_DB", "call_metrics.db"),
+                        help="database file (default: $CALL_METRICS_DB or call_metrics.db)")
+    parser.add_argument("--fresh", action="store_true", help="delete the database file first")
+    parser.add_argument("--days", type=int, default=7, help="days of history ending at --end")
+    parser.add_argument("--agents", type=int, default=10, help="number of agents")
+    parser.add_argument("--customers", type=int, default=9000, help="number of distinct customers")
+    parser.add_argument("--calls-per-hour", type=int, default=30,
+                        help="average calls per business hour across all agents")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible data")
+    parser.add_argument("--end", type=parse_end,
+                        help="end of the generated history, epoch seconds or ISO datetime (default: now)")
+    parser.add_argument("--batch-size", type=int, default=100_000, help="rows per transaction")
+    args = parser.parse_args()
+
+    if args.fresh:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    from benchmarks.common import import_call_api
+    api = import_call_api(args.db)
+
+    print(f"Generating ~{expected_calls(args.days, args.calls_per_hour):,} calls into {args.db}...")
+    started = time.perf_counter()
+    api.init_db()
+    with api.get_db() as conn:
+        rows = api.load_calls(conn, generate_calls(
+            days=args.days,
+            agents=args.agents,
+            customers=args.customers,
+            calls_per_hour=args.calls_per_hour,
+            seed=args.seed,
+            end=args.end,
+            batch_size=args.batch_size,
+        ))
+    api.db_pool.close()
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {rows:,} calls in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
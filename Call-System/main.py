@@ -1,17 +1,145 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from datetime import datetime, timedelta
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 import sqlite3
 import json
+import math
 from contextlib import contextmanager, asynccontextmanager
-import random
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+import asyncio
+import base64
+import binascii
+import csv
+import hashlib
+import heapq
+import io
+import os
+import re
+import threading
+import time
 import uvicorn
+import zlib
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from anomaly import AnomalyDetector
+from sketch import DurationSketch, register_sketch_functions, serialize_values
+from telemetry import CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE, Registry
+
+try:
+    import orjson  # optional: faster encoding for ?fast=true list responses
+except ImportError:
+    orjson = None
 
 # Database configuration
-DB_NAME = "call_metrics.db"
+DB_NAME = os.environ.get("CALL_METRICS_DB", "call_metrics.db")
+DB_POOL_SIZE = int(os.environ.get("CALL_METRICS_DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.environ.get("CALL_METRICS_DB_POOL_TIMEOUT", "10"))
+DB_STATEMENT_CACHE_SIZE = 256
+# Maximum number of requests running database work at once (worker threads)
+DB_MAX_CONCURRENCY = int(os.environ.get("CALL_METRICS_DB_CONCURRENCY", str(DB_POOL_SIZE)))
+
+# /api/metrics reads whole hours from calls_hourly; set to 0 to scan raw calls only
+METRICS_USE_ROLLUPS = os.environ.get("CALL_METRICS_USE_ROLLUPS", "1") != "0"
+METRICS_TOP_AGENTS = 5
+# calls_per_hour bucket widths in seconds; bucket=auto picks the finest one
+# that keeps the series within METRICS_MAX_POINTS points
+METRICS_BUCKETS = {"5m": 300, "15m": 900, "1h": 3600, "1d": 86400}
+METRICS_MAX_POINTS = int(os.environ.get("CALL_METRICS_MAX_POINTS", "200"))
+
+# Response cache for /api/metrics and /api/agents. Entries are invalidated by
+# writes through this process; the TTL bounds staleness from other writers.
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = float(os.environ.get("CALL_METRICS_CACHE_TTL", "60"))
+# Default ("last 24 hours") windows end at now rounded up to this many seconds,
+# so repeated requests share a cache entry
+RESPONSE_CACHE_NOW_RESOLUTION = 10
+
+# Streaming export: rows read per batch, each batch in its own short read
+# transaction; exports beyond EXPORT_MAX_CONCURRENT at once get 503
+EXPORT_BATCH_ROWS = 5000
+EXPORT_MAX_CONCURRENT = int(os.environ.get("CALL_METRICS_EXPORT_CONCURRENCY", str(max(1, DB_POOL_SIZE // 2))))
+EXPORT_COLUMNS = ["call_id", "agent_id", "customer_id", "start_time", "end_time", "duration", "call_outcome"]
+
+# Bulk ingestion: records are validated and inserted this many at a time
+INGEST_CHUNK_SIZE = 1000
+
+# A call submitted again with the same idempotency_key within this many
+# seconds returns the original call instead of inserting a duplicate
+IDEMPOTENCY_TTL = int(os.environ.get("CALL_METRICS_IDEMPOTENCY_TTL", "86400"))
+
+# Optional group commit for POST /api/calls: requests are queued and a single
+# writer thread commits them together every GROUP_COMMIT_INTERVAL_MS or
+# GROUP_COMMIT_MAX_BATCH records, whichever comes first. Each response is sent
+# once its batch has committed.
+GROUP_COMMIT = os.environ.get("CALL_METRICS_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_INTERVAL_MS = float(os.environ.get("CALL_METRICS_GROUP_COMMIT_INTERVAL_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("CALL_METRICS_GROUP_COMMIT_MAX_BATCH", "500"))
+# Requests beyond this many queued records are rejected with 503
+GROUP_COMMIT_MAX_PENDING = GROUP_COMMIT_MAX_BATCH * 20
+
+# Live metrics stream (/api/stream/metrics)
+STREAM_QUEUE_SIZE = 256          # events buffered per subscriber before it is resynced
+STREAM_MAX_CALLS = 50            # newest calls included in each "calls" event
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 300         # streams are closed after this long; clients reconnect
+STREAM_RETRY_MS = 2000
+
+# Anomaly detection on recorded call volume (/api/anomalies)
+ANOMALY_INTERVAL = int(os.environ.get("CALL_METRICS_ANOMALY_INTERVAL", "300"))
+ANOMALY_THRESHOLD = float(os.environ.get("CALL_METRICS_ANOMALY_THRESHOLD", "4"))
+ANOMALY_MIN_DELTA = int(os.environ.get("CALL_METRICS_ANOMALY_MIN_DELTA", "5"))
+ANOMALY_WARMUP_DAYS = int(os.environ.get("CALL_METRICS_ANOMALY_WARMUP_DAYS", "7"))
+ANOMALY_TICK_SECONDS = 5         # how often quiet intervals are closed and evaluated
+
+# Retention: raw calls older than RETENTION_DAYS are purged by maintain() once
+# folded into calls_hourly (0, the default, keeps them forever; compaction and
+# ANALYZE run either way). The job runs every MAINTENANCE_INTERVAL seconds in
+# the API process (0 disables it; run `python main.py maintain` from cron
+# instead).
+RETENTION_DAYS = int(os.environ.get("CALL_METRICS_RETENTION_DAYS", "0"))
+MAINTENANCE_INTERVAL = int(os.environ.get("CALL_METRICS_MAINTENANCE_INTERVAL", "3600"))
+MAINTENANCE_START_DELAY = 60     # first run after startup, in seconds
+MAINTENANCE_BATCH_ROWS = 5000    # raw rows deleted per write transaction
+MAINTENANCE_BATCH_PAUSE = 0.05   # seconds between batches so other writers get the lock
+MAINTENANCE_VACUUM_PAGES = 2000  # free pages returned per incremental_vacuum step
+MAINTENANCE_HISTORY = 100        # run reports kept in maintenance_runs
+
+# Analytics replica: when CALL_METRICS_REPLICA_INTERVAL is set, a read-only
+# copy of the database is refreshed every that many seconds with the online
+# backup API, and metrics, concurrency, agents and export queries read from
+# it instead of competing with ingest for the primary file.
+REPLICA_INTERVAL = float(os.environ.get("CALL_METRICS_REPLICA_INTERVAL", "0"))
+REPLICA_PATH = os.environ.get(
+    "CALL_METRICS_REPLICA_PATH", "{0}.replica{1}".format(*os.path.splitext(DB_NAME)))
+
+# Applied to every pooled connection. WAL lets readers and the writer work
+# concurrently; synchronous=NORMAL is durable across application crashes in WAL mode.
+DB_PRAGMAS = {
+    # Must precede journal_mode to take effect on a new database; existing
+    # ones switch on their next VACUUM (`python main.py maintain --vacuum`)
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": os.environ.get("CALL_METRICS_DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": -64000,        # ~64 MB page cache (negative value = KiB)
+    "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,        # ms to wait on a locked database
+}
+# Replica snapshots are never written once published, so they are opened
+# read-only and immutable (no locking or WAL index)
+REPLICA_PRAGMAS = {
+    "cache_size": DB_PRAGMAS["cache_size"],
+    "mmap_size": DB_PRAGMAS["mmap_size"],
+    "temp_store": DB_PRAGMAS["temp_store"],
+    "query_only": 1,
+}
 
 # Pydantic models
 class CallRecord(BaseModel):
@@ -20,6 +148,8 @@ class CallRecord(BaseModel):
     start_time: datetime
     end_time: datetime
     call_outcome: str = Field(..., example="resolved")
+    # Retries carrying the same key return the original call (see IDEMPOTENCY_TTL)
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=255, example="bridge-7f3a9c")
     
 class CallResponse(BaseModel):
     call_id: int
@@ -30,100 +160,1687 @@ class CallResponse(BaseModel):
     duration: int  # in seconds
     call_outcome: str
 
+class CallPage(BaseModel):
+    calls: List[CallResponse]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next (older) page
+
+class CustomerSummary(BaseModel):
+    customer_id: str
+    total_calls: int
+    total_duration: int  # in seconds
+    average_duration: float
+    calls_by_outcome: dict
+    first_call: datetime
+    last_call: CallResponse
+
+class BatchRecordStatus(BaseModel):
+    index: int
+    status: str  # "created", "duplicate" (idempotency_key seen before) or "error"
+    call_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    received: int
+    created: int
+    duplicates: int = 0
+    failed: int
+    results: List[BatchRecordStatus]
+
 class MetricsResponse(BaseModel):
     total_calls: int
     average_duration: float
+    duration_percentiles: dict = {}  # {"p50", "p90", "p95", "p99"} in seconds
     calls_by_outcome: dict
-    calls_per_hour: List[dict]
+    calls_per_hour: List[dict]  # [{"hour": bucket start, "count"}], one per bucket
     top_agents: List[dict]
+    bucket: str = "1h"
+    timezone: Optional[str] = None  # None: the server's local time
+    agent_ids: Optional[List[str]] = None  # the agent filter, if any
+
+# Connection pool
+class PoolRetired(Exception):
+    """Raised by acquire() on a pool that has been retired"""
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections, handing each thread back its last one"""
+
+    def __init__(self, database, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, pragmas=DB_PRAGMAS):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self._retired = False
+        self._cond = threading.Condition()
+        self._idle = []          # list of (owner thread id, connection)
+        self._size = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_checkout = 0.0
+        self._max_checkout = 0.0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE,
+            uri=self.database.startswith("file:"),
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        register_sketch_functions(conn)
+        return conn
+
+    def acquire(self):
+        started = time.perf_counter()
+        thread_id = threading.get_ident()
+        waited = 0.0
+        conn = None
+        create = False
+
+        with self._cond:
+            while True:
+                if self._retired:
+                    # Its file may already be gone; callers re-read the current pool
+                    raise PoolRetired(self.database)
+                if self._idle:
+                    index = len(self._idle) - 1
+                    for i, (owner, _) in enumerate(self._idle):
+                        if owner == thread_id:
+                            index = i
+                            break
+                    conn = self._idle.pop(index)[1]
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                    break
+
+                wait_started = time.perf_counter()
+                remaining = self.timeout - (wait_started - started)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self._timeouts += 1
+                        raise TimeoutError(
+                            f"No database connection available after {self.timeout}s"
+                        )
+                waited += time.perf_counter() - wait_started
+            self._in_use += 1
+
+        if create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._checkouts += 1
+            self._total_checkout += elapsed
+            self._max_checkout = max(self._max_checkout, elapsed)
+            if waited:
+                self._waits += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._in_use -= 1
+            if self._retired:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((threading.get_ident(), conn))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            for _, conn in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle.clear()
+
+    def retire(self):
+        with self._cond:
+            self._retired = True
+            self._cond.notify_all()
+        self.close()
+
+    @property
+    def drained(self):
+        with self._cond:
+            return self._retired and self._size == 0
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts or 1
+            return {
+                "database": self.database,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_checkout_ms": round(self._total_checkout / checkouts * 1000, 3),
+                "max_checkout_ms": round(self._max_checkout * 1000, 3),
+                "total_wait_ms": round(self._total_wait * 1000, 3),
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+db_pool = ConnectionPool(DB_NAME)
+
+# Prometheus metrics served at /metrics
+telemetry = Registry()
+http_requests = telemetry.counter(
+    "call_api_http_requests_total", "HTTP requests by method, route and status",
+    ("method", "route", "status"))
+http_request_seconds = telemetry.histogram(
+    "call_api_http_request_duration_seconds", "HTTP request latency until the response is complete",
+    ("method", "route"))
+http_in_flight = telemetry.gauge(
+    "call_api_http_requests_in_flight", "HTTP requests currently being served")
+db_query_seconds = telemetry.histogram(
+    "call_api_db_query_duration_seconds", "Time spent holding a database connection, by named query",
+    ("query",))
+db_query_errors = telemetry.counter(
+    "call_api_db_query_errors_total", "Named queries that raised an exception", ("query",))
+# Refreshed on every scrape of /metrics
+db_file_bytes = telemetry.gauge(
+    "call_api_db_file_bytes", "Size of the SQLite database files", ("file",))
+db_rows = telemetry.gauge(
+    "call_api_db_rows", "Rows per table", ("table",))
+db_pool_connections = telemetry.gauge(
+    "call_api_db_pool_connections", "Pooled SQLite connections by state", ("state",))
+db_pool_waits = telemetry.counter(
+    "call_api_db_pool_waits_total", "Checkouts that had to wait for a free connection")
+db_jobs_gauge = telemetry.gauge(
+    "call_api_db_jobs", "Database jobs on the worker executor by state", ("state",))
+response_cache_lookups = telemetry.counter(
+    "call_api_response_cache_lookups_total", "Response cache lookups by result", ("result",))
+ingest_queue_depth = telemetry.gauge(
+    "call_api_ingest_queue_depth", "Calls waiting for the group-commit writer")
+ingest_batches = telemetry.counter(
+    "call_api_ingest_batches_total", "Group-commit batches committed")
+ingest_batch_records = telemetry.histogram(
+    "call_api_ingest_batch_size", "Calls per group-commit batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+replica_age_seconds = telemetry.gauge(
+    "call_api_replica_age_seconds", "Staleness of the analytics replica")
+stream_subscribers = telemetry.gauge(
+    "call_api_stream_subscribers", "Open /api/stream/metrics connections")
+anomalies_detected = telemetry.counter(
+    "call_api_anomalies_total", "Call volume anomalies detected", ("dimension", "kind"))
+maintenance_rows_purged = telemetry.counter(
+    "call_api_maintenance_rows_purged_total", "Raw calls purged by the retention job")
+maintenance_lock_seconds = telemetry.histogram(
+    "call_api_maintenance_lock_seconds", "Write lock held per maintenance step", ("step",))
+http_in_flight.set(0)
 
 # Database context manager
 @contextmanager
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+def get_db(name="other", replica=False):
+    """Check out a pooled connection, from the analytics replica with replica=True"""
+    while True:
+        pool = (replica and analytics_replica.pool) or db_pool
+        try:
+            conn = pool.acquire()
+            break
+        except PoolRetired:
+            # A refresh published a newer copy after the pool was read
+            continue
+    started = time.perf_counter()
     try:
         yield conn
+    except Exception:
+        db_query_errors.inc(query=name)
+        raise
     finally:
-        conn.close()
+        db_query_seconds.observe(time.perf_counter() - started, query=name)
+        if conn.in_transaction:
+            conn.rollback()
+        # Keys inserted by a rolled-back write are gone from the table by now
+        agent_dim.settle(conn)
+        outcome_dim.settle(conn)
+        pool.release(conn)
+
+# Dictionary-encoded dimensions
+class Dimension:
+    """Process-wide cache over a lookup table of strings and integer keys"""
+
+    def __init__(self, table, key_column, value_column):
+        self.table = table
+        self.key_column = key_column
+        self.value_column = value_column
+        self._keys = {}
+        self._values = {}
+        self._staged = {}  # connection -> {value: key} inserted in its open transaction
+
+    def _load(self, conn):
+        rows = conn.execute(
+            f"SELECT {self.key_column}, {self.value_column} FROM {self.table}"
+        ).fetchall()
+        staged = self._staged.get(conn, ())
+        # Rows conn inserted itself are not committed yet
+        self._keys.update((value, key) for key, value in rows if value not in staged)
+        self._values.update((key, value) for key, value in rows if value not in staged)
+
+    def keys(self, conn, values):
+        """Map values to keys, inserting any that are new (visible only to conn until settle())"""
+        staged = self._staged.get(conn, {})
+        missing = [value for value in values if value not in self._keys and value not in staged]
+        if missing:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} ({self.value_column}) VALUES (?)",
+                [(value,) for value in missing]
+            )
+            staged = self._staged.setdefault(conn, {})
+            staged.update(conn.execute(
+                f"SELECT {self.value_column}, {self.key_column} FROM {self.table} "
+                f"WHERE {self.value_column} IN (SELECT value FROM json_each(?))",
+                (json.dumps(missing),)
+            ))
+        return {value: self._keys[value] if value in self._keys else staged[value] for value in values}
+
+    def find(self, conn, value):
+        """Key for a value, or None if it has never been seen"""
+        if value not in self._keys:
+            self._load(conn)
+        return self._keys.get(value)
+
+    def values(self, conn):
+        """Current key -> value mapping"""
+        self._load(conn)
+        staged = self._staged.get(conn)
+        if staged:
+            return {**self._values, **{key: value for value, key in staged.items()}}
+        return self._values
+
+    def settle(self, conn):
+        """Publish the keys conn inserted once its transaction has ended, committed or not"""
+        if self._staged.pop(conn, None) is not None:
+            self._load(conn)
+
+agent_dim = Dimension("agents", "agent_key", "agent_id")
+outcome_dim = Dimension("outcomes", "outcome_key", "call_outcome")
+
+# Timestamps are stored as integer epoch seconds. Naive datetimes are taken to
+# be server local time, as datetime.now() produces them; timestamps are read
+# back as aware datetimes in server local time, so the instant is unambiguous.
+def _to_epoch(dt):
+    return int(dt.timestamp())
+
+def _to_epoch_ceil(dt):
+    """Epoch for an inclusive lower bound, so sub-second bounds don't admit earlier calls"""
+    return math.ceil(dt.timestamp())
+
+def _from_epoch(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).astimezone()
+
+def _iso_from_epoch(ts):
+    """ISO string for an epoch, written as pydantic writes _from_epoch(ts)"""
+    text = _from_epoch(ts).isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+# Decoded call rows, in CallResponse field order
+CALL_SELECT = '''
+    SELECT c.call_id, a.agent_id, c.customer_id, c.start_time, c.end_time, c.duration, o.call_outcome
+    FROM calls c
+    JOIN agents a ON a.agent_key = c.agent_key
+    JOIN outcomes o ON o.outcome_key = c.outcome_key
+'''
+
+def _dump_json(obj):
+    """Compact JSON bytes; datetimes are written as ISO strings"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), default=datetime.isoformat).encode()
+
+CALLS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        call_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        agent_key INTEGER NOT NULL REFERENCES agents(agent_key),
+        customer_id TEXT NOT NULL,
+        start_time INTEGER NOT NULL,     -- epoch seconds
+        end_time INTEGER NOT NULL,       -- epoch seconds
+        duration INTEGER NOT NULL,
+        outcome_key INTEGER NOT NULL REFERENCES outcomes(outcome_key)
+    )
+'''
+
+# Per-agent statistics maintained by every insert path (added to older databases)
+AGENT_STAT_COLUMNS = {
+    "first_seen": "INTEGER",
+    "last_seen": "INTEGER",
+    "call_count": "INTEGER NOT NULL DEFAULT 0",
+    "max_duration": "INTEGER NOT NULL DEFAULT 0",
+}
+
+CALLS_HOURLY_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        hour INTEGER NOT NULL,           -- epoch seconds at the start of the hour
+        agent_key INTEGER NOT NULL,
+        outcome_key INTEGER NOT NULL,
+        call_count INTEGER NOT NULL,
+        total_duration INTEGER NOT NULL,
+        duration_sketch BLOB,            -- serialized DurationSketch (see sketch.py)
+        PRIMARY KEY (hour, agent_key, outcome_key)
+    ) WITHOUT ROWID
+'''
+
+# Blocking sqlite3 work runs on a bounded executor so the event loop stays
+# responsive; requests beyond DB_MAX_CONCURRENCY queue for a worker thread.
+db_executor = None
+db_jobs = {"queued": 0, "running": 0, "completed": 0}
+db_jobs_lock = threading.Lock()
+
+async def run_db(func, *args):
+    """Run func(*args) on a database worker thread and await its result"""
+    def job():
+        with db_jobs_lock:
+            db_jobs["queued"] -= 1
+            db_jobs["running"] += 1
+        try:
+            return func(*args)
+        finally:
+            with db_jobs_lock:
+                db_jobs["running"] -= 1
+                db_jobs["completed"] += 1
+    
+    with db_jobs_lock:
+        db_jobs["queued"] += 1
+    return await asyncio.get_running_loop().run_in_executor(db_executor, job)
+
+# Data version: bumped after every committed write so cached reads can tell
+# whether they are still current
+class DataVersion:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self.modified_at = time.time()
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self.modified_at = time.time()
+            return self.version
+
+data_version = DataVersion()
+
+class AnalyticsReplica:
+    """Read-only snapshot of the database for analytics queries, refreshed into a new file each time"""
+
+    def __init__(self, database, path, interval=REPLICA_INTERVAL):
+        self.database = database
+        self.path = path
+        self.interval = interval
+        self.pool = None
+        self.snapshot_path = None     # file of the published copy
+        self.snapshot_at = None       # when the published copy was last known current
+        self.version = DataVersion()  # bumped whenever a new copy is published
+        self._source = None
+        self._source_version = None
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._retired = []            # (pool, path) of copies still to delete
+        self.refreshes = 0
+        self.unchanged = 0
+        self.failures = 0
+        self.last_copy_seconds = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def _snapshot_path(self, generation):
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{generation}{ext}"
+
+    def _remove_retired(self):
+        """Delete the copies whose pools have drained; the rest are retried later"""
+        pending = []
+        for pool, path in self._retired:
+            if pool is not None and not pool.drained:
+                pending.append((pool, path))
+                continue
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                # Still open in another process
+                pending.append((None, path))
+        self._retired = pending
+
+    def refresh(self):
+        with self._lock:
+            checked_at = time.time()
+            if self._source is None:
+                self._source = sqlite3.connect(self.database, check_same_thread=False)
+                # Copies left behind by an earlier process (and the single
+                # file of older versions)
+                stem, ext = os.path.splitext(self.path)
+                stale = [
+                    os.path.join(os.path.dirname(self.path), name)
+                    for name in os.listdir(os.path.dirname(self.path) or ".")
+                    if re.fullmatch(re.escape(os.path.basename(stem)) + r"\.\d+" + re.escape(ext), name)
+                ]
+                self._retired.extend((None, path) for path in [self.path, *stale])
+            self._remove_retired()
+            source_version = self._source.execute("PRAGMA data_version").fetchone()[0]
+            if self.pool is not None and source_version == self._source_version:
+                self.unchanged += 1
+                self.snapshot_at = checked_at
+                return False
+
+            started = time.perf_counter()
+            self._generation += 1
+            path = self._snapshot_path(self._generation)
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                target = sqlite3.connect(path)
+                try:
+                    self._source.backup(target)
+                    # Leave a plain rollback-journal file that opens read-only
+                    target.execute("PRAGMA journal_mode = DELETE")
+                finally:
+                    target.close()
+            except Exception:
+                self.failures += 1
+                self._retired.append((None, path))
+                raise
+            self.last_copy_seconds = time.perf_counter() - started
+
+            pool = ConnectionPool(f"file:{path}?mode=ro&immutable=1", pragmas=REPLICA_PRAGMAS)
+            previous, self.pool = self.pool, pool
+            if previous is not None:
+                self._retired.append((previous, self.snapshot_path))
+            self.snapshot_path = path
+            self._source_version = source_version
+            self.snapshot_at = checked_at
+            self.refreshes += 1
+            self.version.bump()
+        if previous is not None:
+            previous.retire()
+            with self._lock:
+                self._remove_retired()
+        return True
+
+    def age(self):
+        """Seconds since the published copy was last known to match the database"""
+        return None if self.snapshot_at is None else max(time.time() - self.snapshot_at, 0.0)
+
+    def close(self):
+        with self._lock:
+            if self.pool is not None:
+                self.pool.retire()
+                self._retired.append((self.pool, self.snapshot_path))
+                self.pool = None
+                self.snapshot_path = None
+            self._remove_retired()
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+
+    def stats(self):
+        age = self.age()
+        return {
+            "enabled": self.enabled,
+            "path": self.snapshot_path or self.path,
+            "interval_seconds": self.interval,
+            "snapshot_at": _from_epoch(self.snapshot_at) if self.snapshot_at else None,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "bytes": os.path.getsize(self.snapshot_path) if self.snapshot_path else None,
+            "refreshes": self.refreshes,
+            "unchanged": self.unchanged,
+            "failures": self.failures,
+            "last_copy_ms": round(self.last_copy_seconds * 1000, 1) if self.last_copy_seconds is not None else None,
+            "pool": self.pool.stats() if self.pool is not None else None,
+        }
+
+analytics_replica = AnalyticsReplica(DB_NAME, REPLICA_PATH)
+
+async def _replica_loop():
+    while True:
+        await asyncio.sleep(analytics_replica.interval)
+        try:
+            # Off the database executor so copies never queue behind requests
+            await asyncio.to_thread(analytics_replica.refresh)
+        except Exception as e:
+            print(f"Replica refresh failed: {e!r}")
+
+class ResponseCache:
+    """LRU cache of serialized JSON responses, valid while their DataVersion is unchanged"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, source=data_version):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.source = source
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["version"] != self.source.version or time.time() - entry["created"] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, version, body):
+        entry = {
+            "version": version,
+            "created": time.time(),
+            "body": body,
+            "etag": '"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+            "last_modified": formatdate(self.source.modified_at, usegmt=True),
+        }
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "data_version": self.source.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Cached endpoints read the replica when it is enabled (see lifespan)
+response_cache = ResponseCache()
+
+def _not_modified(request, entry):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return entry["etag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(entry["last_modified"])
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _snapshot_headers():
+    """X-Snapshot-Age for responses answered from the analytics replica"""
+    age = analytics_replica.age() if analytics_replica.enabled else None
+    return {} if age is None else {"X-Snapshot-Age": f"{age:.1f}"}
+
+async def cached_json(request, key, func, *args):
+    """Serve func(*args) from the response cache, with ETag/Last-Modified validation"""
+    entry = response_cache.get(key)
+    if entry is None:
+        response_cache.misses += 1
+        # Read the version first: a write landing mid-query leaves the entry stale
+        version = response_cache.source.version
+        result = await run_db(func, *args)
+        if isinstance(result, BaseModel):
+            # Equivalent compact JSON, serialized by pydantic-core instead of
+            # walking the model with jsonable_encoder
+            body = result.model_dump_json().encode()
+        else:
+            body = json.dumps(jsonable_encoder(result), separators=(",", ":")).encode()
+        entry = response_cache.put(key, version, body)
+    else:
+        response_cache.hits += 1
+    
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": entry["last_modified"],
+        "Cache-Control": "no-cache",
+        **_snapshot_headers(),
+    }
+    if _not_modified(request, entry):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+# Live metrics push. Writers publish from worker threads; each event is
+# encoded once and fanned out to every subscriber on the event loop thread.
+STREAM_RESYNC = b"event: resync\ndata: {}\n\n"
+
+class MetricsPublisher:
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._loop = None
+        self._subscribers = set()
+        self.published = 0
+        self.resyncs = 0
+
+    def attach(self, loop):
+        self._loop = loop
+
+    def detach(self):
+        self._loop = None
+
+    @property
+    def has_subscribers(self):
+        return self._loop is not None and bool(self._subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event, version, data):
+        """Queue a server-sent event for every subscriber (safe from any thread)"""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        message = f"id: {version}\nevent: {event}\ndata: ".encode() + _dump_json(data) + b"\n\n"
+        loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _fan_out(self, message):
+        self.published += 1
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow subscriber: drop its backlog and tell it to refetch
+                self.resyncs += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(STREAM_RESYNC)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "events_published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+metrics_publisher = MetricsPublisher()
+
+anomaly_detector = AnomalyDetector(
+    interval=ANOMALY_INTERVAL, threshold=ANOMALY_THRESHOLD, min_delta=ANOMALY_MIN_DELTA
+)
+
+def _publish_anomaly(anomaly):
+    anomalies_detected.inc(dimension=anomaly["dimension"], kind=anomaly["kind"])
+    metrics_publisher.publish("anomaly", data_version.version, anomaly)
+
+anomaly_detector.listener = _publish_anomaly
+
+def warm_anomaly_detector():
+    """Seed the detector's baselines from the hourly rollup of recent days"""
+    end = int(time.time())
+    start = end - ANOMALY_WARMUP_DAYS * 86400
+    end -= end % 3600  # the current hour is still filling up
+    with get_db("anomaly_warmup") as conn:
+        rows = conn.execute('''
+            SELECT h.hour, a.agent_id, o.call_outcome, h.call_count
+            FROM calls_hourly h
+            JOIN agents a ON a.agent_key = h.agent_key
+            JOIN outcomes o ON o.outcome_key = h.outcome_key
+            WHERE h.hour >= ? AND h.hour < ?
+        ''', (start - start % 3600, end)).fetchall()
+
+    def hourly_counts():
+        for hour, agent_id, call_outcome, count in rows:
+            yield hour, "total", "all", count
+            yield hour, "outcome", call_outcome, count
+            yield hour, "agent", agent_id, count
+
+    anomaly_detector.warm(hourly_counts(), start, end)
+
+async def _anomaly_ticker():
+    while True:
+        await asyncio.sleep(ANOMALY_TICK_SECONDS)
+        anomaly_detector.tick()
+
+def _publish_calls(calls, call_ids, version):
+    """Feed newly committed calls to the anomaly detector and publish their metric deltas"""
+    anomaly_detector.observe((call.call_outcome, call.agent_id) for call in calls)
+    if not metrics_publisher.has_subscribers or not calls:
+        return
+    
+    buckets = {}
+    for call in calls:
+        start = _to_epoch(call.start_time)
+        key = (start - start % 3600, call.agent_id, call.call_outcome)
+        bucket = buckets.setdefault(key, [0, 0])
+        bucket[0] += 1
+        bucket[1] += _call_duration(call)
+    
+    newest = sorted(zip(calls, call_ids), key=lambda item: (_to_epoch(item[0].start_time), item[1]))[-STREAM_MAX_CALLS:]
+    metrics_publisher.publish("calls", version, {
+        "data_version": version,
+        "count": len(calls),
+        # Changed hourly buckets, shaped like calls_hourly rows
+        "buckets": [
+            {
+                "hour": _from_epoch(hour).strftime('%Y-%m-%d %H:00:00'),
+                "agent_id": agent_id,
+                "call_outcome": call_outcome,
+                "count": count,
+                "total_duration": total,
+            }
+            for (hour, agent_id, call_outcome), (count, total) in sorted(buckets.items())
+        ],
+        # Shaped as GET /api/calls returns them once stored
+        "calls": [
+            {
+                "call_id": call_id,
+                "agent_id": call.agent_id,
+                "customer_id": call.customer_id,
+                "start_time": _iso_from_epoch(_to_epoch(call.start_time)),
+                "end_time": _iso_from_epoch(_to_epoch(call.end_time)),
+                "duration": _call_duration(call),
+                "call_outcome": call.call_outcome,
+            }
+            for call, call_id in reversed(newest)
+        ],
+    })
 
 # Initialize database
 def init_db():
-    with get_db() as conn:
+    with get_db("init_db") as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS agents (
+                agent_key INTEGER PRIMARY KEY,
+                agent_id TEXT NOT NULL UNIQUE,
+                first_seen INTEGER,              -- epoch seconds of the earliest call
+                last_seen INTEGER,               -- epoch seconds of the latest call
+                call_count INTEGER NOT NULL DEFAULT 0,
+                max_duration INTEGER NOT NULL DEFAULT 0  -- longest call, bounds concurrency lookback
+            )
+        ''')
+        agent_columns = {row['name'] for row in conn.execute("PRAGMA table_info(agents)")}
+        missing_stats = [column for column in AGENT_STAT_COLUMNS if column not in agent_columns]
+        for column in missing_stats:
+            conn.execute(f"ALTER TABLE agents ADD COLUMN {column} {AGENT_STAT_COLUMNS[column]}")
+        needs_agent_stats = bool(missing_stats)
         conn.execute('''
-            CREATE TABLE IF NOT EXISTS calls (
-                call_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                agent_id TEXT NOT NULL,
-                customer_id TEXT NOT NULL,
-                start_time TIMESTAMP NOT NULL,
-                end_time TIMESTAMP NOT NULL,
-                duration INTEGER NOT NULL,
-                call_outcome TEXT NOT NULL
+            CREATE TABLE IF NOT EXISTS outcomes (
+                outcome_key INTEGER PRIMARY KEY,
+                call_outcome TEXT NOT NULL UNIQUE
             )
         ''')
+        # Client-supplied keys of recently recorded calls; expired by maintain()
         conn.execute('''
-            CREATE INDEX IF NOT EXISTS idx_start_time ON calls(start_time);
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                idempotency_key TEXT PRIMARY KEY,
+                call_id INTEGER NOT NULL,
+                created_at INTEGER NOT NULL      -- epoch seconds
+            ) WITHOUT ROWID
         ''')
         conn.execute('''
-            CREATE INDEX IF NOT EXISTS idx_agent_id ON calls(agent_id);
+            CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at)
         ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                run_id INTEGER PRIMARY KEY,
+                started_at INTEGER NOT NULL,     -- epoch seconds
+                raw_horizon INTEGER NOT NULL,    -- raw calls before this epoch have been purged
+                report TEXT                      -- JSON report, set when the run completes
+            )
+        ''')
+        conn.commit()
+        
+        if _is_legacy_schema(conn):
+            report = migrate_schema(conn)
+            print(f"Migrated calls to the compact schema: {json.dumps(report, indent=2)}")
+            needs_agent_stats = True
+        
+        conn.execute(CALLS_TABLE_SQL.format(table="calls"))
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calls_start_time ON calls(start_time);
+        ''')
+        # Per-agent lookups and agent-filtered metrics; supersedes the
+        # single-column agent_key index of older databases
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calls_agent_start ON calls(agent_key, start_time);
+        ''')
+        conn.execute("DROP INDEX IF EXISTS idx_calls_agent_key")
+        # Per-customer history and summaries (/api/customers/{customer_id}/...)
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calls_customer_start ON calls(customer_id, start_time);
+        ''')
+        # Hourly rollup maintained by every insert path, used by /api/metrics
+        conn.execute(CALLS_HOURLY_TABLE_SQL.format(table="calls_hourly"))
+        hourly_columns = {row['name'] for row in conn.execute("PRAGMA table_info(calls_hourly)")}
+        needs_sketches = "duration_sketch" not in hourly_columns
+        if needs_sketches:
+            conn.execute("ALTER TABLE calls_hourly ADD COLUMN duration_sketch BLOB")
+        # Decoded, human-readable view for ad-hoc queries and other tools
+        conn.execute('''
+            CREATE VIEW IF NOT EXISTS calls_view AS
+            SELECT
+                c.call_id,
+                a.agent_id,
+                c.customer_id,
+                datetime(c.start_time, 'unixepoch', 'localtime') as start_time,
+                datetime(c.end_time, 'unixepoch', 'localtime') as end_time,
+                c.duration,
+                o.call_outcome
+            FROM calls c
+            JOIN agents a ON a.agent_key = c.agent_key
+            JOIN outcomes o ON o.outcome_key = c.outcome_key
+        ''')
+        conn.commit()
+
+        # Backfill the rollup the first time it is created (or gains duration
+        # sketches) on an existing database
+        has_rollups = conn.execute("SELECT 1 FROM calls_hourly LIMIT 1").fetchone()
+        has_calls = conn.execute("SELECT 1 FROM calls LIMIT 1").fetchone()
+        if has_calls and (needs_sketches or not has_rollups):
+            rebuild_rollups(conn)
+        elif has_calls and needs_agent_stats:
+            rebuild_agent_stats(conn)
+
+# Rebuild the hourly rollup and agent statistics from raw calls (backfill / repair).
+# Hours before the retention horizon have no raw rows left and are kept as they are.
+def rebuild_rollups(conn):
+    horizon = _raw_horizon(conn)
+    rebuild_agent_stats(conn)
+    conn.execute("DELETE FROM calls_hourly WHERE hour >= ?", (horizon,))
+    conn.execute('''
+        INSERT INTO calls_hourly (hour, agent_key, outcome_key, call_count, total_duration, duration_sketch)
+        SELECT
+            start_time - start_time % 3600 as hour,
+            agent_key,
+            outcome_key,
+            COUNT(*),
+            SUM(duration),
+            sketch_agg(duration)
+        FROM calls
+        WHERE start_time >= ?
+        GROUP BY hour, agent_key, outcome_key
+    ''', (horizon,))
+    conn.commit()
+    data_version.bump()
+    return conn.execute("SELECT COUNT(*) FROM calls_hourly").fetchone()[0]
+
+def rebuild_agent_stats(conn):
+    conn.execute("UPDATE agents SET first_seen = NULL, last_seen = NULL, call_count = 0, max_duration = 0")
+    # Purged calls are only left in calls_hourly, to the hour
+    conn.execute('''
+        WITH stats AS (
+            SELECT agent_key, MIN(first_seen) as first_seen, MAX(last_seen) as last_seen,
+                   SUM(call_count) as call_count, MAX(max_duration) as max_duration
+            FROM (
+                SELECT agent_key, MIN(start_time) as first_seen, MAX(start_time) as last_seen,
+                       COUNT(*) as call_count, MAX(duration) as max_duration
+                FROM calls
+                WHERE start_time >= :horizon
+                GROUP BY agent_key
+                UNION ALL
+                SELECT agent_key, MIN(hour), MAX(hour), SUM(call_count), 0
+                FROM calls_hourly
+                WHERE hour < :horizon
+                GROUP BY agent_key
+            )
+            GROUP BY agent_key
+        )
+        UPDATE agents SET
+            first_seen = stats.first_seen,
+            last_seen = stats.last_seen,
+            call_count = stats.call_count,
+            max_duration = stats.max_duration
+        FROM stats
+        WHERE stats.agent_key = agents.agent_key
+    ''', {"horizon": _raw_horizon(conn)})
+    conn.commit()
+    data_version.bump()
+
+# Online migration from the original schema (ISO TEXT timestamps, string dimensions)
+MIGRATION_BATCH_SIZE = 50000
+
+def _is_legacy_schema(conn):
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(calls)")}
+    return "agent_id" in columns
+
+def _db_size(conn):
+    """Bytes used by live pages (excludes free pages that VACUUM would reclaim)"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_size * (page_count - free_pages)
+
+def _time_query(conn, sql, params, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+# Representative raw-row queries timed before and after the migration:
+# (name, legacy SQL, compact SQL, window in seconds ending at the newest call)
+MIGRATION_PROBES = [
+    (
+        "range_count_24h",
+        "SELECT COUNT(*), AVG(duration) FROM calls WHERE start_time >= ? AND start_time <= ?",
+        "SELECT COUNT(*), AVG(duration) FROM calls WHERE start_time >= ? AND start_time <= ?",
+        86400,
+    ),
+    (
+        "hourly_by_agent_outcome_7d",
+        "SELECT strftime('%Y-%m-%d %H:00:00', start_time) as hour, agent_id, call_outcome, "
+        "COUNT(*), SUM(duration) FROM calls WHERE start_time >= ? AND start_time <= ? "
+        "GROUP BY hour, agent_id, call_outcome",
+        "SELECT start_time - start_time % 3600 as hour, agent_key, outcome_key, "
+        "COUNT(*), SUM(duration) FROM calls WHERE start_time >= ? AND start_time <= ? "
+        "GROUP BY hour, agent_key, outcome_key",
+        7 * 86400,
+    ),
+]
+
+def migrate_schema(conn, batch_size=MIGRATION_BATCH_SIZE):
+    """Rewrite a legacy calls table into the compact schema in short transactions and report the gains"""
+    started = time.perf_counter()
+    size_before = _db_size(conn)
+    
+    newest = conn.execute("SELECT MAX(start_time) FROM calls").fetchone()[0]
+    newest = datetime.fromisoformat(newest) if newest else datetime.now()
+    timings_before = {
+        name: _time_query(conn, legacy_sql, ((newest - timedelta(seconds=window)).isoformat(), newest.isoformat()))
+        for name, legacy_sql, _, window in MIGRATION_PROBES
+    }
+    
+    conn.create_function(
+        "iso_to_epoch", 1,
+        lambda value: _to_epoch(datetime.fromisoformat(value)),
+        deterministic=True
+    )
+    conn.execute("DROP TABLE IF EXISTS calls_v2")
+    conn.execute("DROP TABLE IF EXISTS calls_hourly_v2")
+    conn.execute(CALLS_TABLE_SQL.format(table="calls_v2"))
+    conn.execute(CALLS_HOURLY_TABLE_SQL.format(table="calls_hourly_v2"))
+    # Index names differ from the legacy ones, so they can be built during the
+    # copy and travel with the table when it is renamed
+    conn.execute("CREATE INDEX idx_calls_start_time ON calls_v2(start_time)")
+    conn.execute("CREATE INDEX idx_calls_agent_start ON calls_v2(agent_key, start_time)")
+    conn.execute("CREATE INDEX idx_calls_customer_start ON calls_v2(customer_id, start_time)")
+    conn.execute("INSERT OR IGNORE INTO agents (agent_id) SELECT DISTINCT agent_id FROM calls")
+    conn.execute("INSERT OR IGNORE INTO outcomes (call_outcome) SELECT DISTINCT call_outcome FROM calls")
+    conn.commit()
+    
+    def copy_range(low, high):
+        conn.execute('''
+            INSERT INTO calls_v2 (call_id, agent_key, customer_id, start_time, end_time, duration, outcome_key)
+            SELECT c.call_id, a.agent_key, c.customer_id,
+                   iso_to_epoch(c.start_time), iso_to_epoch(c.end_time), c.duration, o.outcome_key
+            FROM calls c
+            JOIN agents a ON a.agent_id = c.agent_id
+            JOIN outcomes o ON o.call_outcome = c.call_outcome
+            WHERE c.call_id > ? AND c.call_id <= ?
+        ''', (low, high))
+        conn.execute('''
+            INSERT INTO calls_hourly_v2 (hour, agent_key, outcome_key, call_count, total_duration, duration_sketch)
+            SELECT start_time - start_time % 3600 as hour, agent_key, outcome_key,
+                   COUNT(*), SUM(duration), sketch_agg(duration)
+            FROM calls_v2
+            WHERE call_id > ? AND call_id <= ?
+            GROUP BY hour, agent_key, outcome_key
+            ON CONFLICT (hour, agent_key, outcome_key) DO UPDATE SET
+                call_count = call_count + excluded.call_count,
+                total_duration = total_duration + excluded.total_duration,
+                duration_sketch = sketch_merge(duration_sketch, excluded.duration_sketch)
+        ''', (low, high))
+    
+    copied_to = 0
+    max_id = conn.execute("SELECT COALESCE(MAX(call_id), 0) FROM calls").fetchone()[0]
+    while copied_to < max_id:
+        copy_range(copied_to, copied_to + batch_size)
         conn.commit()
+        copied_to += batch_size
+    
+    # Catch up on rows written during the copy and swap the tables atomically
+    swap_started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("INSERT OR IGNORE INTO agents (agent_id) SELECT DISTINCT agent_id FROM calls WHERE call_id > ?", (copied_to,))
+    conn.execute("INSERT OR IGNORE INTO outcomes (call_outcome) SELECT DISTINCT call_outcome FROM calls WHERE call_id > ?", (copied_to,))
+    copy_range(copied_to, 2 ** 62)
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'calls'").fetchone()
+    conn.execute("DROP TABLE calls")
+    conn.execute("DROP TABLE IF EXISTS calls_hourly")
+    conn.execute("ALTER TABLE calls_v2 RENAME TO calls")
+    conn.execute("ALTER TABLE calls_hourly_v2 RENAME TO calls_hourly")
+    if sequence:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'calls'", (sequence[0],))
+    conn.commit()
+    swap_seconds = time.perf_counter() - swap_started
+    
+    newest = _to_epoch(newest)
+    timings_after = {
+        name: _time_query(conn, compact_sql, (newest - window, newest))
+        for name, _, compact_sql, window in MIGRATION_PROBES
+    }
+    size_after = _db_size(conn)
+    
+    return {
+        "rows_migrated": conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0],
+        "seconds": round(time.perf_counter() - started, 2),
+        "swap_lock_seconds": round(swap_seconds, 3),
+        "data_bytes_before": size_before,
+        "data_bytes_after": size_after,
+        "size_ratio": round(size_before / size_after, 2) if size_after else None,
+        "query_ms_before": timings_before,
+        "query_ms_after": timings_after,
+        "speedup": {
+            name: round(timings_before[name] / timings_after[name], 2) if timings_after[name] else None
+            for name in timings_before
+        },
+    }
+
+# Retention and compaction
+maintenance_lock = threading.Lock()
+
+def _raw_horizon(conn):
+    """Epoch before which raw calls have been purged (0 if none ever were)"""
+    return conn.execute("SELECT COALESCE(MAX(raw_horizon), 0) FROM maintenance_runs").fetchone()[0]
+
+def maintain(conn, retention_days=RETENTION_DAYS, now=None):
+    """Purge raw calls older than retention_days and expired idempotency keys, then compact and re-analyze"""
+    started = time.perf_counter()
+    now = time.time() if now is None else now
+    locks = []
+
+    def locked(step, func):
+        step_started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - step_started
+        locks.append(elapsed)
+        maintenance_lock_seconds.observe(elapsed, step=step)
+        return result
+
+    horizon = _raw_horizon(conn)
+    run_id = conn.execute(
+        "INSERT INTO maintenance_runs (started_at, raw_horizon) VALUES (?, ?)", (int(now), horizon)
+    ).lastrowid
+    conn.commit()
+    # Measured after the run's own bookkeeping row is written
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+
+    # 1. Downsample and purge whole hours before the cutoff
+    purged = rollup_rows = batches = 0
+    cutoff = 0
+    if retention_days > 0:
+        cutoff = int(now) - retention_days * 86400
+        cutoff -= cutoff % 3600
+    while cutoff:
+        oldest = conn.execute("SELECT MIN(start_time) FROM calls").fetchone()[0]
+        if oldest is None or oldest >= cutoff:
+            break
+        low = oldest - oldest % 3600
+        # End the batch at the hour holding its last row (at least one hour)
+        row = conn.execute(
+            "SELECT start_time FROM calls WHERE start_time < ? ORDER BY start_time LIMIT 1 OFFSET ?",
+            (cutoff, MAINTENANCE_BATCH_ROWS - 1)
+        ).fetchone()
+        high = cutoff if row is None else min(max(row[0] - row[0] % 3600, low + 3600), cutoff)
+
+        def purge_batch():
+            conn.execute("BEGIN IMMEDIATE")
+            added = conn.execute('''
+                INSERT INTO calls_hourly (hour, agent_key, outcome_key, call_count, total_duration, duration_sketch)
+                SELECT start_time - start_time % 3600 as hour, agent_key, outcome_key,
+                       COUNT(*), SUM(duration), sketch_agg(duration)
+                FROM calls
+                WHERE start_time < ?
+                GROUP BY hour, agent_key, outcome_key
+                ON CONFLICT (hour, agent_key, outcome_key) DO NOTHING
+            ''', (high,)).rowcount
+            deleted = conn.execute("DELETE FROM calls WHERE start_time < ?", (high,)).rowcount
+            conn.execute(
+                "UPDATE maintenance_runs SET raw_horizon = MAX(raw_horizon, ?) WHERE run_id = ?", (high, run_id)
+            )
+            conn.commit()
+            return added, deleted
+
+        added, deleted = locked("purge", purge_batch)
+        rollup_rows += added
+        purged += deleted
+        batches += 1
+        maintenance_rows_purged.inc(deleted)
+        time.sleep(MAINTENANCE_BATCH_PAUSE)
+    if purged:
+        data_version.bump()
+
+    # 2. Forget idempotency keys past their TTL, in batches as well
+    expired = 0
+    while True:
+        def expire_batch():
+            deleted = conn.execute('''
+                DELETE FROM idempotency_keys WHERE idempotency_key IN (
+                    SELECT idempotency_key FROM idempotency_keys WHERE created_at < ? LIMIT ?
+                )
+            ''', (int(now) - IDEMPOTENCY_TTL, MAINTENANCE_BATCH_ROWS)).rowcount
+            conn.commit()
+            return deleted
+        
+        deleted = locked("expire_keys", expire_batch)
+        expired += deleted
+        if deleted < MAINTENANCE_BATCH_ROWS:
+            break
+        time.sleep(MAINTENANCE_BATCH_PAUSE)
+
+    # 3. Return free pages to the file system a step at a time
+    auto_vacuum = {0: "none", 1: "full", 2: "incremental"}[conn.execute("PRAGMA auto_vacuum").fetchone()[0]]
+    if auto_vacuum == "incremental":
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free_pages:
+            # executescript steps the pragma to completion; execute() frees one page
+            locked("vacuum", lambda: conn.executescript(
+                f"PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES});"))
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free_pages:
+                break
+            free_pages = remaining
+            time.sleep(MAINTENANCE_BATCH_PAUSE)
+
+    # 4. Refresh planner statistics from a bounded sample of each index
+    conn.execute("PRAGMA analysis_limit = 1000")
+    locked("analyze", lambda: conn.execute("ANALYZE"))
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+    horizon = _raw_horizon(conn)
+    report = {
+        "started_at": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+        "retention_days": retention_days,
+        "raw_horizon": _from_epoch(horizon).isoformat() if horizon else None,
+        "rows_downsampled": purged,
+        "rollup_rows_added": rollup_rows,
+        "batches": batches,
+        "idempotency_keys_expired": expired,
+        "auto_vacuum": auto_vacuum,
+        # Rollup rows added while purging can grow the file
+        "bytes_reclaimed": max(pages_before - pages_after, 0) * page_size,
+        "free_bytes": conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size,
+        "database_bytes": pages_after * page_size,
+        "lock_seconds": round(sum(locks), 3),
+        "max_lock_seconds": round(max(locks, default=0), 3),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    conn.execute("UPDATE maintenance_runs SET report = ? WHERE run_id = ?", (json.dumps(report), run_id))
+    conn.execute("DELETE FROM maintenance_runs WHERE run_id <= ?", (run_id - MAINTENANCE_HISTORY,))
+    conn.commit()
+    return report
+
+def run_maintenance():
+    """Run maintain() unless a run is already in progress; returns its report, or None"""
+    if not maintenance_lock.acquire(blocking=False):
+        return None
+    try:
+        with get_db("maintenance") as conn:
+            return maintain(conn)
+    finally:
+        maintenance_lock.release()
+
+async def _maintenance_loop():
+    await asyncio.sleep(MAINTENANCE_START_DELAY)
+    while True:
+        try:
+            # Off the database executor: a run pauses between batches and
+            # should not hold a request worker meanwhile
+            report = await asyncio.to_thread(run_maintenance)
+            if report and (report["rows_downsampled"] or report["bytes_reclaimed"]):
+                print(f"Maintenance: {json.dumps(report)}")
+        except Exception as e:
+            print(f"Maintenance failed: {e!r}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
 
 # Generate fake data
 def generate_fake_data():
-    agents = [f"AGT{str(i).zfill(3)}" for i in range(1, 11)]
-    outcomes = ["resolved", "escalated", "dropped", "voicemail", "callback"]
+    """Seed an empty database with a week of demo calls (see generate_data.py)"""
+    from generate_data import generate_calls
     
-    with get_db() as conn:
+    with get_db("seed") as conn:
         # Check if data already exists
         cursor = conn.execute("SELECT COUNT(*) FROM calls")
         if cursor.fetchone()[0] > 0:
             return
         
-        # Generate calls for the last 7 days
-        base_date = datetime.now() - timedelta(days=7)
+        load_calls(conn, generate_calls(days=7, agents=10))
+
+def load_calls(conn, batches):
+    """Bulk-load batches of (agent_id, customer_id, start, end, outcome) epoch tuples; returns the row count"""
+    loaded = 0
+    for batch in batches:
+        agent_keys = agent_dim.keys(conn, {row[0] for row in batch})
+        outcome_keys = outcome_dim.keys(conn, {row[4] for row in batch})
+        _insert_rows(conn, [
+            (agent_keys[agent_id], customer_id, start_time, end_time, end_time - start_time, outcome_keys[call_outcome])
+            for agent_id, customer_id, start_time, end_time, call_outcome in batch
+        ])
+        conn.commit()
+        loaded += len(batch)
+    if loaded:
+        data_version.bump()
+    return loaded
+
+def clear_calls(conn):
+    """Delete every call and the rollups, agent statistics and idempotency keys derived from them"""
+    conn.execute("DELETE FROM calls")
+    conn.execute("DELETE FROM calls_hourly")
+    conn.execute("DELETE FROM idempotency_keys")
+    conn.execute("UPDATE agents SET first_seen = NULL, last_seen = NULL, call_count = 0, max_duration = 0")
+    conn.commit()
+    data_version.bump()
+
+def _row_to_call(row):
+    return CallResponse(
+        call_id=row['call_id'],
+        agent_id=row['agent_id'],
+        customer_id=row['customer_id'],
+        start_time=_from_epoch(row['start_time']),
+        end_time=_from_epoch(row['end_time']),
+        duration=row['duration'],
+        call_outcome=row['call_outcome']
+    )
+
+# Opaque keyset pagination cursors over (start_time, call_id)
+def _encode_cursor(start_time, call_id):
+    payload = json.dumps([start_time, call_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_time, call_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(start_time, int) or not isinstance(call_id, int):
+            raise ValueError
+        return start_time, call_id
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Insert validated calls within the caller's transaction
+def _insert_calls(conn, calls):
+    """Insert CallRecords, skipping idempotent replays; returns (call_ids, created) in call order"""
+    if not calls:
+        return [], []
+    
+    keyed = [call.idempotency_key for call in calls if call.idempotency_key]
+    if not keyed:
+        return _insert_new_calls(conn, calls), [True] * len(calls)
+    
+    # Look the keys up under the write lock, so a concurrent retry of the
+    # same call cannot slip in between the check and the insert
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    now = int(time.time())
+    known = dict(conn.execute('''
+        SELECT k.idempotency_key, k.call_id
+        FROM idempotency_keys k
+        JOIN calls c ON c.call_id = k.call_id
+        WHERE k.idempotency_key IN (SELECT value FROM json_each(?)) AND k.created_at >= ?
+    ''', (json.dumps(keyed), now - IDEMPOTENCY_TTL)))
+    
+    new_calls = []
+    first_seen = {}                  # key -> index into new_calls
+    for call in calls:
+        key = call.idempotency_key
+        if key is None or (key not in known and key not in first_seen):
+            if key is not None:
+                first_seen[key] = len(new_calls)
+            new_calls.append(call)
+    new_ids = _insert_new_calls(conn, new_calls)
+    # Keys that expired (or whose call was purged) are simply taken over
+    conn.executemany(
+        "INSERT OR REPLACE INTO idempotency_keys (idempotency_key, call_id, created_at) VALUES (?, ?, ?)",
+        [(key, new_ids[i], now) for key, i in first_seen.items()]
+    )
+    
+    call_ids, created = [], []
+    new_index = 0
+    for call in calls:
+        key = call.idempotency_key
+        if key in known:
+            call_ids.append(known[key])
+            created.append(False)
+        elif key is not None and first_seen[key] < new_index:
+            call_ids.append(new_ids[first_seen[key]])
+            created.append(False)
+        else:
+            call_ids.append(new_ids[new_index])
+            created.append(True)
+            new_index += 1
+    return call_ids, created
+
+def _insert_new_calls(conn, calls):
+    """Insert CallRecords with one executemany and return their call_ids in order"""
+    if not calls:
+        return []
+    
+    agent_keys = agent_dim.keys(conn, {call.agent_id for call in calls})
+    outcome_keys = outcome_dim.keys(conn, {call.call_outcome for call in calls})
+    return _insert_rows(conn, [
+        (
+            agent_keys[call.agent_id],
+            call.customer_id,
+            _to_epoch(call.start_time),
+            _to_epoch(call.end_time),
+            _call_duration(call),
+            outcome_keys[call.call_outcome]
+        )
+        for call in calls
+    ])
+
+def _insert_rows(conn, rows):
+    """Insert encoded call rows and fold them into calls_hourly; returns their call_ids in order"""
+    conn.executemany('''
+        INSERT INTO calls (agent_key, customer_id, start_time, end_time, duration, outcome_key)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    # SQLite allows a single writer, so rowids within one statement are contiguous
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    # Fold the new rows into agent statistics and the hourly rollup in the
+    # same transaction
+    agents = {}
+    for agent_key, _, start_time, _, duration, _ in rows:
+        agent = agents.get(agent_key)
+        if agent is None:
+            agents[agent_key] = [start_time, start_time, 1, duration]
+        else:
+            agent[0] = min(agent[0], start_time)
+            agent[1] = max(agent[1], start_time)
+            agent[2] += 1
+            agent[3] = max(agent[3], duration)
+    conn.executemany('''
+        UPDATE agents SET
+            first_seen = MIN(COALESCE(first_seen, :first_seen), :first_seen),
+            last_seen = MAX(COALESCE(last_seen, :last_seen), :last_seen),
+            call_count = call_count + :call_count,
+            max_duration = MAX(max_duration, :max_duration)
+        WHERE agent_key = :agent_key
+    ''', [
+        {"agent_key": agent_key, "first_seen": first, "last_seen": last, "call_count": count,
+         "max_duration": longest}
+        for agent_key, (first, last, count, longest) in agents.items()
+    ])
+
+    buckets = {}
+    for agent_key, _, start_time, _, duration, outcome_key in rows:
+        key = (start_time - start_time % 3600, agent_key, outcome_key)
+        bucket = buckets.setdefault(key, [0, 0, []])
+        bucket[0] += 1
+        bucket[1] += duration
+        bucket[2].append(duration)
+    conn.executemany('''
+        INSERT INTO calls_hourly (hour, agent_key, outcome_key, call_count, total_duration, duration_sketch)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (hour, agent_key, outcome_key) DO UPDATE SET
+            call_count = call_count + excluded.call_count,
+            total_duration = total_duration + excluded.total_duration,
+            duration_sketch = sketch_merge(duration_sketch, excluded.duration_sketch)
+    ''', [
+        (*key, count, total, serialize_values(durations))
+        for key, (count, total, durations) in buckets.items()
+    ])
+
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+def _call_duration(call):
+    """Whole seconds between start and end, as stored in calls.duration"""
+    return int((call.end_time - call.start_time).total_seconds())
+
+def _validate_call(record):
+    """Validate one raw batch record, returning (CallRecord, None) or (None, error)"""
+    if isinstance(record, Exception):
+        return None, f"Invalid JSON: {record}"
+    try:
+        call = CallRecord.model_validate(record)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc']) or 'record'}: {err['msg']}"
+            for err in e.errors()
+        )
+    if _call_duration(call) <= 0:
+        return None, "End time must be after start time"
+    return call, None
+
+def _ingest_chunk(chunk, offset):
+    """Validate a chunk of raw records and insert the valid ones in one transaction"""
+    results = []
+    valid = []
+    for i, record in enumerate(chunk, start=offset):
+        call, error = _validate_call(record)
+        if call is None:
+            results.append(BatchRecordStatus(index=i, status="error", error=error))
+        else:
+            valid.append((i, call))
+
+    with get_db("ingest_batch") as conn:
+        call_ids, created = _insert_calls(conn, [call for _, call in valid])
+        conn.commit()
+    if any(created):
+        _publish_calls(
+            [call for (_, call), new in zip(valid, created) if new],
+            [call_id for call_id, new in zip(call_ids, created) if new],
+            data_version.bump()
+        )
+    for (i, _), call_id, new in zip(valid, call_ids, created):
+        results.append(BatchRecordStatus(index=i, status="created" if new else "duplicate", call_id=call_id))
+    return results
+
+def _create_call(call):
+    """Insert one call; returns (CallResponse, created)"""
+    with get_db("insert_call") as conn:
+        (call_id,), (created,) = _insert_calls(conn, [call])
+        conn.commit()
+        if created:
+            _publish_calls([call], [call_id], data_version.bump())
         
-        for day in range(7):
-            current_date = base_date + timedelta(days=day)
-            # More calls during business hours (9 AM - 6 PM)
-            for hour in range(24):
-                if 9 <= hour <= 18:
-                    num_calls = random.randint(20, 40)
+        # Fetch the created (or original) record
+        cursor = conn.execute(
+            CALL_SELECT + " WHERE c.call_id = ?", 
+            (call_id,)
+        )
+        return _row_to_call(cursor.fetchone()), created
+
+class GroupCommitWriter:
+    """Write-behind buffer that commits queued calls in one transaction per batch"""
+
+    def __init__(self, interval_ms=GROUP_COMMIT_INTERVAL_MS, max_batch=GROUP_COMMIT_MAX_BATCH,
+                 max_pending=GROUP_COMMIT_MAX_PENDING):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._pending = []           # list of (CallRecord, Future)
+        self._pending_since = 0.0
+        self._stopping = False
+        self._thread = None
+        self.batches = 0
+        self.records = 0
+        self.failed_batches = 0
+        self.rejected = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+        self.total_commit = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="call-group-commit", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Flush everything still queued and stop the writer thread"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+
+    def submit(self, call):
+        """Queue a validated call; the Future resolves to (CallResponse, created) after commit"""
+        future = Future()
+        with self._cond:
+            if self._stopping or len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Ingest queue is full, retry later")
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append((call, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = self._pending_since + self.interval
+                while len(self._pending) < self.max_batch and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._pending_since = time.monotonic()
+            self._flush(batch)
+
+    def _flush(self, batch):
+        calls = [call for call, _ in batch]
+        started = time.perf_counter()
+        try:
+            with get_db("group_commit") as conn:
+                call_ids, created = _insert_calls(conn, calls)
+                conn.commit()
+                if all(created):
+                    # New rowids are contiguous: fetch them as one range
+                    rows = conn.execute(
+                        CALL_SELECT + " WHERE c.call_id BETWEEN ? AND ? ORDER BY c.call_id",
+                        (call_ids[0], call_ids[-1])
+                    ).fetchall()
                 else:
-                    num_calls = random.randint(0, 10)
-                
-                for _ in range(num_calls):
-                    start_time = current_date.replace(
-                        hour=hour, 
-                        minute=random.randint(0, 59),
-                        second=random.randint(0, 59)
-                    )
-                    # Call duration between 30 seconds and 20 minutes
-                    duration = random.randint(30, 1200)
-                    end_time = start_time + timedelta(seconds=duration)
-                    
-                    conn.execute('''
-                        INSERT INTO calls (agent_id, customer_id, start_time, end_time, duration, call_outcome)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        random.choice(agents),
-                        f"CUST{random.randint(1000, 9999)}",
-                        start_time.isoformat(),
-                        end_time.isoformat(),
-                        duration,
-                        random.choice(outcomes)
-                    ))
+                    found = {row['call_id']: row for row in conn.execute(
+                        CALL_SELECT + " WHERE c.call_id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(call_ids),)
+                    )}
+                    rows = [found[call_id] for call_id in call_ids]
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
         
-        conn.commit()
+        if any(created):
+            _publish_calls(
+                [call for call, new in zip(calls, created) if new],
+                [call_id for call_id, new in zip(call_ids, created) if new],
+                data_version.bump()
+            )
+        self.batches += 1
+        self.records += len(batch)
+        ingest_batch_records.observe(len(batch))
+        self.last_batch_size = len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.total_commit += time.perf_counter() - started
+        for (_, future), row, new in zip(batch, rows, created):
+            future.set_result((_row_to_call(row), new))
+
+    def stats(self):
+        return {
+            "enabled": True,
+            "flush_interval_ms": self.interval * 1000,
+            "max_batch": self.max_batch,
+            "max_pending": self.max_pending,
+            "queue_depth": len(self._pending),
+            "batches": self.batches,
+            "records": self.records,
+            "failed_batches": self.failed_batches,
+            "rejected": self.rejected,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_seen,
+            "avg_batch_size": round(self.records / self.batches, 2) if self.batches else 0.0,
+            "avg_commit_ms": round(self.total_commit / self.batches * 1000, 3) if self.batches else 0.0,
+        }
+
+group_writer = None
+
+def _fetchall(query, params=(), name="other"):
+    with get_db(name) as conn:
+        return conn.execute(query, params).fetchall()
+
+async def _iter_ndjson(request):
+    """Yield decoded records (or the decode error) from a streamed NDJSON body"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield e
+    if buffer.strip():
+        try:
+            yield json.loads(buffer)
+        except json.JSONDecodeError as e:
+            yield e
 
 # Initialize FastAPI app with lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global db_executor, group_writer
     # Startup
+    db_executor = ThreadPoolExecutor(max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="call-db")
     init_db()
     generate_fake_data()
+    warm_anomaly_detector()
+    replica_task = None
+    if analytics_replica.enabled:
+        analytics_replica.refresh()
+        response_cache.source = analytics_replica.version
+        replica_task = asyncio.create_task(_replica_loop())
+    metrics_publisher.attach(asyncio.get_running_loop())
+    anomaly_ticker = asyncio.create_task(_anomaly_ticker())
+    maintenance_task = asyncio.create_task(_maintenance_loop()) if MAINTENANCE_INTERVAL > 0 else None
+    if GROUP_COMMIT:
+        group_writer = GroupCommitWriter()
+        group_writer.start()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    anomaly_ticker.cancel()
+    if maintenance_task:
+        maintenance_task.cancel()
+    if replica_task:
+        replica_task.cancel()
+    if group_writer:
+        group_writer.stop()
+        group_writer = None
+    metrics_publisher.detach()
+    db_executor.shutdown(wait=True)
+    analytics_replica.close()
+    db_pool.close()
 
 app = FastAPI(title="Call Metrics API", version="1.0.0", lifespan=lifespan)
 
@@ -136,181 +1853,1038 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class RequestMetricsMiddleware:
+    """ASGI middleware recording count, latency and in-flight requests per route template"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = {}
+
+    def _route(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            path = next(
+                (route.path for route in app.routes if getattr(route, "endpoint", None) is endpoint),
+                "unmatched"
+            )
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = self._route(scope)
+            http_requests.inc(method=scope["method"], route=route, status=str(status))
+            http_request_seconds.observe(time.perf_counter() - started, method=scope["method"], route=route)
+
+app.add_middleware(RequestMetricsMiddleware)
+
 # API Endpoints
 @app.get("/")
 async def root():
     return {"message": "Call Metrics API", "version": "1.0.0"}
 
 @app.post("/api/calls", response_model=CallResponse)
-async def create_call(call: CallRecord):
+async def create_call(
+    call: CallRecord,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)
+):
     """Record a new call"""
-    duration = int((call.end_time - call.start_time).total_seconds())
-    
-    if duration <= 0:
+    if _call_duration(call) <= 0:
         raise HTTPException(status_code=400, detail="End time must be after start time")
     
-    with get_db() as conn:
-        cursor = conn.execute('''
-            INSERT INTO calls (agent_id, customer_id, start_time, end_time, duration, call_outcome)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            call.agent_id,
-            call.customer_id,
-            call.start_time.isoformat(),
-            call.end_time.isoformat(),
-            duration,
-            call.call_outcome
-        ))
-        conn.commit()
-        
-        # Fetch the created record
-        cursor = conn.execute(
-            "SELECT * FROM calls WHERE call_id = ?", 
-            (cursor.lastrowid,)
-        )
-        row = cursor.fetchone()
-        
-        return CallResponse(
-            call_id=row['call_id'],
-            agent_id=row['agent_id'],
-            customer_id=row['customer_id'],
-            start_time=datetime.fromisoformat(row['start_time']),
-            end_time=datetime.fromisoformat(row['end_time']),
-            duration=row['duration'],
-            call_outcome=row['call_outcome']
-        )
+    if idempotency_key:
+        if call.idempotency_key and call.idempotency_key != idempotency_key:
+            raise HTTPException(status_code=400, detail="Idempotency-Key header and idempotency_key field differ")
+        call.idempotency_key = idempotency_key
+    
+    if group_writer:
+        result, created = await asyncio.wrap_future(group_writer.submit(call))
+    else:
+        result, created = await run_db(_create_call, call)
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
-@app.get("/api/calls", response_model=List[CallResponse])
+@app.post("/api/calls/batch", response_model=BatchResponse)
+async def create_calls_batch(request: Request):
+    """Record many calls from a JSON array or a streamed NDJSON body"""
+    results = []
+    received = 0
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        chunk = []
+        async for record in _iter_ndjson(request):
+            chunk.append(record)
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                results.extend(await run_db(_ingest_chunk, chunk, received))
+                received += len(chunk)
+                chunk = []
+        results.extend(await run_db(_ingest_chunk, chunk, received))
+        received += len(chunk)
+    else:
+        try:
+            records = json.loads(await request.body())
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of calls")
+        for offset in range(0, len(records), INGEST_CHUNK_SIZE):
+            chunk = records[offset:offset + INGEST_CHUNK_SIZE]
+            results.extend(await run_db(_ingest_chunk, chunk, offset))
+        received = len(records)
+
+    results.sort(key=lambda r: r.index)
+    created = sum(1 for r in results if r.status == "created")
+    duplicates = sum(1 for r in results if r.status == "duplicate")
+    return BatchResponse(
+        received=received,
+        created=created,
+        duplicates=duplicates,
+        failed=received - created - duplicates,
+        results=results
+    )
+
+@app.get("/api/calls", response_model=CallPage)
 async def get_calls(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    agent_id: Optional[str] = Query(None),
-    limit: int = Query(100, ge=1, le=1000)
+    agent_id: Optional[List[str]] = Query(None, description="repeat for several agents"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fast: bool = Query(False, description="serialize rows straight from the database (same JSON shape)"),
+    customer_id: Optional[str] = Query(None, description="exact customer_id")
 ):
-    """Retrieve call records with optional filtering"""
-    query = "SELECT * FROM calls WHERE 1=1"
+    """Retrieve call records, newest first, with optional filtering"""
+    query = CALL_SELECT + " WHERE 1=1"
     params = []
     
     if start_date:
-        query += " AND start_time >= ?"
-        params.append(start_date.isoformat())
+        query += " AND c.start_time >= ?"
+        params.append(_to_epoch_ceil(start_date))
     
     if end_date:
-        query += " AND start_time <= ?"
-        params.append(end_date.isoformat())
+        query += " AND c.start_time <= ?"
+        params.append(_to_epoch(end_date))
     
-    if agent_id:
-        query += " AND agent_id = ?"
-        params.append(agent_id)
+    if agent_id and len(agent_id) == 1:
+        # One agent: pages are walked along the (agent_key, start_time) index
+        query += " AND c.agent_key = (SELECT agent_key FROM agents WHERE agent_id = ?)"
+        params.append(agent_id[0])
+    elif agent_id:
+        query += " AND c.agent_key IN (SELECT agent_key FROM agents WHERE agent_id IN (SELECT value FROM json_each(?)))"
+        params.append(json.dumps(agent_id))
     
-    query += " ORDER BY start_time DESC LIMIT ?"
-    params.append(limit)
+    if customer_id:
+        query += " AND c.customer_id = ?"
+        params.append(customer_id)
     
-    with get_db() as conn:
-        cursor = conn.execute(query, params)
-        rows = cursor.fetchall()
-        
-        return [
-            CallResponse(
-                call_id=row['call_id'],
-                agent_id=row['agent_id'],
-                customer_id=row['customer_id'],
-                start_time=datetime.fromisoformat(row['start_time']),
-                end_time=datetime.fromisoformat(row['end_time']),
-                duration=row['duration'],
-                call_outcome=row['call_outcome']
+    if cursor:
+        query += " AND (c.start_time, c.call_id) < (?, ?)"
+        params.extend(_decode_cursor(cursor))
+    
+    # Fetch one extra row to learn whether another page follows
+    query += " ORDER BY c.start_time DESC, c.call_id DESC LIMIT ?"
+    params.append(limit + 1)
+    
+    if fast:
+        return Response(content=await run_db(_fast_call_page, query, params, limit), media_type="application/json")
+    
+    rows = await run_db(_fetchall, query, params, "list_calls")
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['start_time'], rows[-1]['call_id'])
+    
+    return CallPage(
+        calls=[_row_to_call(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+def _fast_call_page(query, params, limit):
+    """CallPage JSON built from plain cursor tuples, without CallResponse models"""
+    with get_db("list_calls") as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(query, params).fetchall()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][3], rows[-1][0])
+    
+    from_epoch = _iso_from_epoch
+    return _dump_json({
+        "calls": [
+            {
+                "call_id": call_id,
+                "agent_id": agent_id,
+                "customer_id": customer_id,
+                "start_time": from_epoch(start_time),
+                "end_time": from_epoch(end_time),
+                "duration": duration,
+                "call_outcome": call_outcome,
+            }
+            for call_id, agent_id, customer_id, start_time, end_time, duration, call_outcome in rows
+        ],
+        "next_cursor": next_cursor
+    })
+
+@app.get("/api/customers/{customer_id}/calls", response_model=CallPage)
+async def get_customer_calls(
+    customer_id: str,
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fast: bool = Query(False, description="serialize rows straight from the database (same JSON shape)")
+):
+    """One customer's calls, newest first, paginated as GET /api/calls"""
+    return await get_calls(
+        start_date=start_date, end_date=end_date, agent_id=None, limit=limit,
+        cursor=cursor, fast=fast, customer_id=customer_id
+    )
+
+def _customer_summary(customer_id):
+    with get_db("customer_summary") as conn:
+        outcomes = conn.execute('''
+            SELECT outcome_key, COUNT(*), SUM(duration), MIN(start_time)
+            FROM calls
+            WHERE customer_id = ?
+            GROUP BY outcome_key
+        ''', (customer_id,)).fetchall()
+        if not outcomes:
+            return None
+        last_call = conn.execute(
+            CALL_SELECT + " WHERE c.customer_id = ? ORDER BY c.start_time DESC, c.call_id DESC LIMIT 1",
+            (customer_id,)
+        ).fetchone()
+        call_outcomes = outcome_dim.values(conn)
+    
+    total_calls = sum(row[1] for row in outcomes)
+    total_duration = sum(row[2] for row in outcomes)
+    return CustomerSummary(
+        customer_id=customer_id,
+        total_calls=total_calls,
+        total_duration=total_duration,
+        average_duration=round(total_duration / total_calls, 2),
+        calls_by_outcome={call_outcomes[row[0]]: row[1] for row in outcomes},
+        first_call=_from_epoch(min(row[3] for row in outcomes)),
+        last_call=_row_to_call(last_call)
+    )
+
+@app.get("/api/customers/{customer_id}/summary", response_model=CustomerSummary)
+async def get_customer_summary(customer_id: str):
+    """Call count, first and last call, outcome mix and average duration for one customer"""
+    summary = await run_db(_customer_summary, customer_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No calls for customer {customer_id}")
+    return summary
+
+export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+def _export_chunks(query, params, export_format, gzip):
+    """Yield encoded export chunks, one keyset-paged batch of EXPORT_BATCH_ROWS at a time"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    
+    def encode(text):
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+    
+    batch_query = query + '''
+        AND c.call_id <= ? AND (c.start_time, c.call_id) > (?, ?)
+        ORDER BY c.start_time, c.call_id
+        LIMIT ?
+    '''
+    last_id = None
+    position = (-1, -1)
+    if export_format == "csv":
+        yield encode(",".join(EXPORT_COLUMNS) + "\r\n")
+    while True:
+        with get_db("export", replica=True) as conn:
+            if last_id is None:
+                last_id = conn.execute("SELECT COALESCE(MAX(call_id), 0) FROM calls").fetchone()[0]
+            rows = conn.execute(batch_query, [*params, last_id, *position, EXPORT_BATCH_ROWS]).fetchall()
+        if rows:
+            position = (rows[-1][3], rows[-1][0])
+            buffer = io.StringIO()
+            if export_format == "csv":
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow((
+                        row[0], row[1], row[2],
+                        _from_epoch(row[3]).isoformat(), _from_epoch(row[4]).isoformat(),
+                        row[5], row[6]
+                    ))
+            else:
+                for row in rows:
+                    buffer.write(json.dumps({
+                        "call_id": row[0],
+                        "agent_id": row[1],
+                        "customer_id": row[2],
+                        "start_time": _from_epoch(row[3]).isoformat(),
+                        "end_time": _from_epoch(row[4]).isoformat(),
+                        "duration": row[5],
+                        "call_outcome": row[6],
+                    }, separators=(",", ":")))
+                    buffer.write("\n")
+            chunk = encode(buffer.getvalue())
+            if chunk:
+                yield chunk
+        if len(rows) < EXPORT_BATCH_ROWS:
+            break
+    if compressor:
+        yield compressor.flush()
+
+async def _stream_on_db_executor(iterator):
+    """Drive a blocking iterator on the database executor from an async response"""
+    done = object()
+    try:
+        while True:
+            chunk = await run_db(next, iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        # Also reached when the client disconnects early. The iterator holds
+        # no connection between chunks, so closing it needs no database work;
+        # one still running on the executor finishes its chunk and is dropped
+        try:
+            iterator.close()
+        except ValueError:
+            pass
+
+class ExportResponse(StreamingResponse):
+    """Streaming response that holds an export slot for exactly as long as it is sent"""
+
+    async def __call__(self, scope, receive, send):
+        # Taken here rather than in the handler, so a request cancelled before
+        # its body starts can't leave the slot taken
+        if not export_slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=503, detail="Too many exports in progress, retry later", headers={"Retry-After": "10"}
             )
-            for row in rows
-        ]
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            export_slots.release()
 
-@app.get("/api/metrics", response_model=MetricsResponse)
-async def get_metrics(
+@app.get("/api/calls/export")
+async def export_calls(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
     start_date: Optional[datetime] = Query(None),
-    end_date: Optional[datetime] = Query(None)
+    end_date: Optional[datetime] = Query(None),
+    agent_id: Optional[List[str]] = Query(None, description="repeat for several agents"),
+    compression: Optional[str] = Query(None, pattern="^gzip$"),
+    customer_id: Optional[str] = Query(None, description="exact customer_id")
 ):
-    """Get aggregated call metrics"""
-    # Default to last 24 hours if no dates provided
-    if not end_date:
-        end_date = datetime.now()
-    if not start_date:
-        start_date = end_date - timedelta(hours=24)
+    """Stream call records, oldest first, as CSV or NDJSON"""
+    query = CALL_SELECT + " WHERE 1=1"
+    params = []
     
-    with get_db() as conn:
-        # Total calls and average duration
-        cursor = conn.execute('''
-            SELECT 
-                COUNT(*) as total_calls,
-                AVG(duration) as avg_duration
-            FROM calls
-            WHERE start_time >= ? AND start_time <= ?
-        ''', (start_date.isoformat(), end_date.isoformat()))
-        
-        row = cursor.fetchone()
-        total_calls = row['total_calls'] or 0
-        avg_duration = row['avg_duration'] or 0
-        
-        # Calls by outcome
-        cursor = conn.execute('''
-            SELECT call_outcome, COUNT(*) as count
-            FROM calls
-            WHERE start_time >= ? AND start_time <= ?
-            GROUP BY call_outcome
-        ''', (start_date.isoformat(), end_date.isoformat()))
-        
-        calls_by_outcome = {row['call_outcome']: row['count'] for row in cursor.fetchall()}
-        
-        # Calls per hour
-        cursor = conn.execute('''
+    if start_date:
+        query += " AND c.start_time >= ?"
+        params.append(_to_epoch_ceil(start_date))
+    
+    if end_date:
+        query += " AND c.start_time <= ?"
+        params.append(_to_epoch(end_date))
+    
+    if agent_id and len(agent_id) == 1:
+        query += " AND c.agent_key = (SELECT agent_key FROM agents WHERE agent_id = ?)"
+        params.append(agent_id[0])
+    elif agent_id:
+        query += " AND c.agent_key IN (SELECT agent_key FROM agents WHERE agent_id IN (SELECT value FROM json_each(?)))"
+        params.append(json.dumps(agent_id))
+    
+    if customer_id:
+        query += " AND c.customer_id = ?"
+        params.append(customer_id)
+    
+    gzip = compression == "gzip"
+    filename = f"calls.{export_format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if export_format == "csv" else "application/x-ndjson")
+    return ExportResponse(
+        _stream_on_db_executor(_export_chunks(query, params, export_format, gzip)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', **_snapshot_headers()}
+    )
+
+# Metrics engine
+class MetricsAggregator:
+    """Single-pass fold of (interval, agent_key, outcome_key, count, duration, sketch) rows"""
+
+    def __init__(self):
+        self.total_calls = 0
+        self.total_duration = 0
+        self.outcomes = {}
+        self.hours = {}
+        self.agents = {}
+
+    def consume(self, cursor):
+        outcomes, hours, agents = self.outcomes, self.hours, self.agents
+        total_calls = total_duration = 0
+        for hour, agent_key, outcome_key, count, duration, sketch in cursor:
+            total_calls += count
+            total_duration += duration
+            outcomes[outcome_key] = outcomes.get(outcome_key, 0) + count
+            hours[hour] = hours.get(hour, 0) + count
+            agent = agents.get(agent_key)
+            if agent is None:
+                agent = agents[agent_key] = [0, 0, []]
+            agent[0] += count
+            agent[1] += duration
+            if sketch is not None:
+                # Serialized sketches concatenate, so each agent's are decoded once in result()
+                agent[2].append(sketch)
+        self.total_calls += total_calls
+        self.total_duration += total_duration
+        return self
+
+    def result(self, agent_ids, call_outcomes, bucket="1h", zone=None, top_n=METRICS_TOP_AGENTS, filter_ids=None):
+        """Build the response, folding the grouped intervals into `bucket`-wide buckets of local time in `zone`"""
+        # Ties are broken on agent_id so the ranking does not depend on the
+        # order in which the engine produced its rows
+        ranked = sorted(self.agents.items(), key=lambda item: (-item[1][0], agent_ids[item[0]]))
+        sketches = {agent_key: DurationSketch.merged(agent[2]) for agent_key, agent in ranked}
+        overall = DurationSketch()
+        for sketch in sketches.values():
+            overall.merge(sketch)
+        # Labels are computed once per grouped interval, never per call
+        width = METRICS_BUCKETS[bucket]
+        series = {}
+        for interval, count in sorted(self.hours.items()):
+            label = _bucket_label(interval, width, zone)
+            series[label] = series.get(label, 0) + count
+        return MetricsResponse(
+            total_calls=self.total_calls,
+            average_duration=round(self.total_duration / self.total_calls, 2) if self.total_calls else 0,
+            duration_percentiles=overall.quantiles(),
+            calls_by_outcome={
+                call_outcomes[outcome_key]: count
+                for outcome_key, count in self.outcomes.items()
+            },
+            calls_per_hour=[{"hour": label, "count": count} for label, count in series.items()],
+            top_agents=[
+                {
+                    "agent_id": agent_ids[agent_key],
+                    "call_count": count,
+                    "avg_duration": round(duration / count, 2),
+                    "duration_percentiles": sketches[agent_key].quantiles()
+                }
+                for agent_key, (count, duration, _) in ranked[:top_n]
+            ],
+            bucket=bucket,
+            timezone=zone.key if zone else None,
+            agent_ids=filter_ids
+        )
+
+def _bucket_label(ts, width, zone=None):
+    """Start of the local-time bucket containing epoch ts, as 'YYYY-MM-DD HH:MM:SS'"""
+    local = datetime.fromtimestamp(ts, zone)
+    if width >= 86400:
+        return local.strftime('%Y-%m-%d 00:00:00')
+    minutes = width // 60
+    return local.strftime(f'%Y-%m-%d %H:{local.minute - local.minute % minutes:02d}:00')
+
+def _utc_offset(ts, zone=None):
+    if zone is None:
+        return time.localtime(ts).tm_gmtoff
+    return int(datetime.fromtimestamp(ts, zone).utcoffset().total_seconds())
+
+def _interval_width(bucket, start, end, zone=None):
+    """Width of the epoch-aligned intervals to group calls by for `bucket` in `zone`"""
+    width = METRICS_BUCKETS[bucket]
+    if width < 3600:
+        return width
+    if _utc_offset(start, zone) % 3600 or _utc_offset(end, zone) % 3600:
+        return 900
+    return 3600
+
+def resolve_bucket(bucket, start, end):
+    """Map bucket=auto to the finest width with at most METRICS_MAX_POINTS buckets"""
+    if bucket != "auto":
+        return bucket
+    for name, width in METRICS_BUCKETS.items():
+        if (end - start) // width < METRICS_MAX_POINTS:
+            return name
+    return "1d"
+
+def _parse_timezone(name):
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone: {name}")
+
+def _whole_hours(start, end):
+    """[first_hour, last_hour) covering the whole hours inside epoch window [start, end]"""
+    first_hour = -(-start // 3600) * 3600
+    last_hour = end - end % 3600
+    if first_hour >= last_hour:
+        # No whole hour in the window: the first edge covers all of it
+        first_hour = last_hour = end + 1
+    return first_hour, last_hour
+
+def compute_metrics(conn, start_date, end_date, use_rollups=None, bucket="1h", zone=None, agent_ids=None):
+    """Aggregate metrics for [start_date, end_date] with a single query"""
+    if use_rollups is None:
+        use_rollups = METRICS_USE_ROLLUPS
+    start, end = _to_epoch_ceil(start_date), _to_epoch(end_date)
+    width = _interval_width(bucket, start, end, zone)
+    aggregator = MetricsAggregator()
+    
+    params = {"start": start, "end": end, "width": width}
+    agent_filter = ""
+    if agent_ids:
+        agent_keys = [key for key in (agent_dim.find(conn, agent_id) for agent_id in agent_ids) if key is not None]
+        if not agent_keys:
+            return aggregator.result({}, {}, bucket, zone, filter_ids=agent_ids)
+        agent_filter = "AND agent_key IN (SELECT value FROM json_each(:agents))"
+        params["agents"] = json.dumps(agent_keys)
+    
+    horizon = _raw_horizon(conn)
+    if start < horizon:
+        # Raw calls before the retention horizon have been purged: that part
+        # of the window is answered from calls_hourly, to the hour
+        aggregator.consume(conn.execute(f'''
+            SELECT hour, agent_key, outcome_key, call_count, total_duration, duration_sketch
+            FROM calls_hourly
+            WHERE hour >= :first_hour AND hour <= :end AND hour < :horizon {agent_filter}
+        ''', {**params, "first_hour": start - start % 3600, "horizon": horizon}))
+        start = params["start"] = horizon
+    
+    if not use_rollups or width != 3600:
+        cursor = conn.execute(f'''
             SELECT 
-                strftime('%Y-%m-%d %H:00:00', start_time) as hour,
-                COUNT(*) as count
+                start_time - start_time % :width as interval,
+                agent_key,
+                outcome_key,
+                COUNT(*),
+                SUM(duration),
+                sketch_agg(duration)
             FROM calls
-            WHERE start_time >= ? AND start_time <= ?
-            GROUP BY hour
-            ORDER BY hour
-        ''', (start_date.isoformat(), end_date.isoformat()))
-        
-        calls_per_hour = [
-            {"hour": row['hour'], "count": row['count']} 
-            for row in cursor.fetchall()
-        ]
-        
-        # Top agents by call count
-        cursor = conn.execute('''
+            WHERE start_time >= :start AND start_time <= :end {agent_filter}
+            GROUP BY interval, agent_key, outcome_key
+        ''', params)
+        aggregator.consume(cursor)
+    else:
+        # Whole hours inside the window are read from calls_hourly; only the
+        # partial hours at either edge are aggregated from raw rows.
+        first_hour, last_hour = _whole_hours(start, end)
+        cursor = conn.execute(f'''
+            SELECT hour, agent_key, outcome_key, call_count, total_duration, duration_sketch
+            FROM calls_hourly
+            WHERE hour >= :first_hour AND hour < :last_hour {agent_filter}
+            UNION ALL
             SELECT 
-                agent_id,
-                COUNT(*) as call_count,
-                AVG(duration) as avg_duration
+                start_time - start_time % 3600 as hour,
+                agent_key,
+                outcome_key,
+                COUNT(*),
+                SUM(duration),
+                sketch_agg(duration)
             FROM calls
-            WHERE start_time >= ? AND start_time <= ?
-            GROUP BY agent_id
-            ORDER BY call_count DESC
-            LIMIT 5
-        ''', (start_date.isoformat(), end_date.isoformat()))
-        
-        top_agents = [
-            {
-                "agent_id": row['agent_id'],
-                "call_count": row['call_count'],
-                "avg_duration": round(row['avg_duration'], 2)
-            }
-            for row in cursor.fetchall()
+            WHERE ((start_time >= :start AND start_time < :first_hour)
+               OR (start_time >= :last_hour AND start_time <= :end)) {agent_filter}
+            GROUP BY hour, agent_key, outcome_key
+        ''', {**params, "first_hour": first_hour, "last_hour": last_hour})
+        aggregator.consume(cursor)
+    
+    return aggregator.result(agent_dim.values(conn), outcome_dim.values(conn), bucket, zone, filter_ids=agent_ids)
+
+def _metrics_window(start_date, end_date, zone=None):
+    """Apply zone to naive dates and default to the 24 hours up to now"""
+    if zone and start_date and start_date.tzinfo is None:
+        start_date = start_date.replace(tzinfo=zone)
+    if zone and end_date and end_date.tzinfo is None:
+        end_date = end_date.replace(tzinfo=zone)
+    if not end_date:
+        now = time.time()
+        end_date = datetime.fromtimestamp(now - now % -RESPONSE_CACHE_NOW_RESOLUTION, zone)
+    if not start_date:
+        start_date = end_date - timedelta(hours=24)
+    return start_date, end_date
+
+def _metrics_for_window(start_date, end_date, bucket, zone, agent_ids=None):
+    with get_db("metrics", replica=True) as conn:
+        return compute_metrics(conn, start_date, end_date, bucket=bucket, zone=zone, agent_ids=agent_ids)
+
+@app.get("/api/metrics", response_model=MetricsResponse)
+async def get_metrics(
+    request: Request,
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    bucket: str = Query("1h", pattern="^(5m|15m|1h|1d|auto)$"),
+    tz: Optional[str] = Query(None, description="IANA time zone, e.g. Europe/Berlin"),
+    agent_id: Optional[List[str]] = Query(None, description="only these agents; repeat for several")
+):
+    """Get aggregated call metrics"""
+    zone = _parse_timezone(tz)
+    start_date, end_date = _metrics_window(start_date, end_date, zone)
+    start, end = _to_epoch_ceil(start_date), _to_epoch(end_date)
+    bucket = resolve_bucket(bucket, start, end)
+    agent_ids = sorted(set(agent_id)) if agent_id else None
+    key = ("metrics", start, end, bucket, zone and zone.key, agent_ids and tuple(agent_ids))
+    return await cached_json(request, key, _metrics_for_window, start_date, end_date, bucket, zone, agent_ids)
+
+# Concurrency engine
+class ConcurrencyResponse(BaseModel):
+    bucket: str
+    timezone: Optional[str] = None
+    peak_concurrent: int
+    peak_time: Optional[datetime] = None
+    average_concurrent: float
+    timeline: List[dict]  # [{"hour": bucket start, "peak", "average"}] for every bucket
+    agents: List[dict]    # [{"agent_id", "peak_concurrent", "average_concurrent", "timeline"}]
+
+class Occupancy:
+    """Sweep-line occupancy of calls over epoch-aligned intervals of `width` seconds"""
+
+    def __init__(self, width, start, stop):
+        self.width = width
+        self.start = start
+        self.stop = stop
+        self.peaks = {}
+        self.busy = {}
+        self.peak = 0
+        self.peak_time = None
+        # The sweep keeps its state in the locals of a generator, so feeding
+        # it a call costs one send()
+        self._sweep = self._sweeper()
+        next(self._sweep)
+        self.add = self._sweep.send
+
+    def _sweeper(self):
+        """Generator consuming (agent_key, start_time, end_time) rows in start order until None"""
+        heappush, heappop = heapq.heappush, heapq.heappop
+        width, peaks, busy = self.width, self.peaks, self.busy
+        ends = []
+        interval = self.start - self.start % width
+        following = interval + width
+        peak = seconds = 0
+        best, best_time = 0, None
+
+        while True:
+            row = yield
+            if row is None:
+                break
+            _, call_start, call_end = row
+            while call_start >= following:
+                # Close the interval at its boundary and carry the calls in progress over;
+                # busy seconds are the durations started in it minus the time left at close
+                while ends and ends[0] <= following:
+                    heappop(ends)
+                remaining = sum(ends) - following * len(ends)
+                if peak:
+                    peaks[interval] = peak
+                if seconds - remaining:
+                    busy[interval] = seconds - remaining
+                peak, seconds = len(ends), remaining
+                interval, following = following, following + width
+                if not ends and call_start >= following:
+                    interval = call_start - call_start % width
+                    following = interval + width
+            while ends and ends[0] <= call_start:
+                heappop(ends)
+            heappush(ends, call_end)
+            seconds += call_end - call_start
+            if len(ends) > peak:
+                peak = len(ends)
+                if peak > best:
+                    best, best_time = peak, call_start
+
+        # Walk the calls still in progress to the end of the window
+        while ends:
+            boundary = min(following, self.stop)
+            while ends and ends[0] <= boundary:
+                heappop(ends)
+            remaining = sum(ends) - boundary * len(ends)
+            if peak:
+                peaks[interval] = peak
+            if seconds - remaining:
+                busy[interval] = seconds - remaining
+            if boundary == self.stop:
+                break
+            peak, seconds = len(ends), remaining
+            interval, following = following, following + width
+        else:
+            if peak:
+                peaks[interval] = peak
+            if seconds:
+                busy[interval] = seconds
+        self.peak, self.peak_time = best, best_time
+
+    def finish(self):
+        try:
+            self.add(None)
+        except StopIteration:
+            pass
+        return self
+
+def compute_concurrency(conn, start_date, end_date, bucket="1h", zone=None):
+    """Peak and average concurrent calls over [start_date, end_date], overall and per agent"""
+    start, end = _to_epoch_ceil(start_date), _to_epoch(end_date)
+    stop = end + 1  # the window covers whole seconds [start, end]
+    width = _interval_width(bucket, start, end, zone)
+
+    # Calls still running at the window start began at most one maximum call
+    # duration earlier, so the start_time index bounds the scan on both sides
+    lookback = conn.execute("SELECT COALESCE(MAX(max_duration), 0) FROM agents").fetchone()[0]
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute('''
+        SELECT agent_key, MAX(start_time, :start), end_time
+        FROM calls
+        WHERE start_time >= :from_time AND start_time <= :end AND end_time > :start
+        ORDER BY start_time
+    ''', {"from_time": start - lookback, "start": start, "end": end})
+
+    # Rows stream from the index straight into the overall and per-agent sweeps
+    overall = Occupancy(width, start, stop)
+    add_overall = overall.add
+    agents = {}
+    adders = {}
+    for call in cursor:
+        add_overall(call)
+        add = adders.get(call[0])
+        if add is None:
+            occupancy = agents[call[0]] = Occupancy(width, start, stop)
+            add = adders[call[0]] = occupancy.add
+        add(call)
+    overall.finish()
+    for occupancy in agents.values():
+        occupancy.finish()
+
+    # Merge intervals into buckets; averages divide by the part of each bucket
+    # inside the window
+    bucket_width = METRICS_BUCKETS[bucket]
+    intervals = range(start - start % width, end - end % width + 1, width)
+    labels = {i: _bucket_label(i, bucket_width, zone) for i in intervals}
+    bucket_seconds = {}
+    for i, label in labels.items():
+        bucket_seconds[label] = bucket_seconds.get(label, 0) + min(i + width, stop) - max(i, start)
+
+    def timeline(occupancy, sparse):
+        # A sparse timeline only has the intervals with calls in progress, and
+        # the sweep records those in order
+        peaks, busy = occupancy.peaks, occupancy.busy
+        covered = ((i, labels[i]) for i in peaks) if sparse else labels.items()
+        if width == bucket_width:
+            return [
+                {"hour": label, "peak": peaks.get(i, 0), "average": round(busy.get(i, 0) / bucket_seconds[label], 3)}
+                for i, label in covered
+            ]
+        points = {}
+        for i, label in covered:
+            point = points.get(label)
+            if point is None:
+                point = points[label] = [0, 0]
+            point[0] = max(point[0], peaks.get(i, 0))
+            point[1] += busy.get(i, 0)
+        return [
+            {"hour": label, "peak": peak, "average": round(seconds / bucket_seconds[label], 3)}
+            for label, (peak, seconds) in points.items()
+            if peak or not sparse
         ]
-        
-        return MetricsResponse(
-            total_calls=total_calls,
-            average_duration=round(avg_duration, 2),
-            calls_by_outcome=calls_by_outcome,
-            calls_per_hour=calls_per_hour,
-            top_agents=top_agents
-        )
+
+    def average(occupancy):
+        return round(sum(occupancy.busy.values()) / (stop - start), 3)
+
+    agent_ids = agent_dim.values(conn)
+    agent_rows = sorted((
+        {
+            "agent_id": agent_ids[agent_key],
+            "peak_concurrent": occupancy.peak,
+            "average_concurrent": average(occupancy),
+            "timeline": timeline(occupancy, sparse=True),
+        }
+        for agent_key, occupancy in agents.items()
+    ), key=lambda row: (row["peak_concurrent"], row["average_concurrent"]), reverse=True)
+    return ConcurrencyResponse(
+        bucket=bucket,
+        timezone=zone.key if zone else None,
+        peak_concurrent=overall.peak,
+        peak_time=_from_epoch(overall.peak_time) if overall.peak_time is not None else None,
+        average_concurrent=average(overall),
+        timeline=timeline(overall, sparse=False),
+        agents=agent_rows,
+    )
+
+def _concurrency_for_window(start_date, end_date, bucket, zone):
+    with get_db("concurrency", replica=True) as conn:
+        return compute_concurrency(conn, start_date, end_date, bucket, zone)
+
+@app.get("/api/metrics/concurrency", response_model=ConcurrencyResponse)
+async def get_concurrency(
+    request: Request,
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    bucket: str = Query("1h", pattern="^(5m|15m|1h|1d|auto)$"),
+    tz: Optional[str] = Query(None, description="IANA time zone, e.g. Europe/Berlin")
+):
+    """Peak and average number of calls in progress at once, overall and per agent"""
+    zone = _parse_timezone(tz)
+    start_date, end_date = _metrics_window(start_date, end_date, zone)
+    start, end = _to_epoch_ceil(start_date), _to_epoch(end_date)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    bucket = resolve_bucket(bucket, start, end)
+    key = ("concurrency", start, end, bucket, zone and zone.key)
+    return await cached_json(request, key, _concurrency_for_window, start_date, end_date, bucket, zone)
+
+@app.get("/api/stream/metrics")
+async def stream_metrics(request: Request, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events stream of metric deltas as calls are inserted"""
+    loop = asyncio.get_running_loop()
+    
+    async def events():
+        queue = metrics_publisher.subscribe()
+        try:
+            version = data_version.version
+            yield (
+                f"retry: {STREAM_RETRY_MS}\nid: {version}\nevent: hello\ndata: ".encode()
+                + _dump_json({"data_version": version}) + b"\n\n"
+            )
+            if last_event_id and last_event_id.isdigit() and int(last_event_id) < version:
+                yield STREAM_RESYNC
+            
+            # Bounded lifetime so shutdowns are not held open by idle streams
+            deadline = loop.time() + STREAM_MAX_SECONDS
+            while loop.time() < deadline:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    message = b": keepalive\n\n"
+                yield message
+        finally:
+            metrics_publisher.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/anomalies")
+async def get_anomalies(
+    since_id: int = Query(0, ge=0, description="Only anomalies with a larger id"),
+    limit: int = Query(100, ge=1, le=500),
+    dimension: Optional[str] = Query(None, pattern="^(total|outcome|agent)$")
+):
+    """Recent call volume anomalies, newest first, with the detector's state"""
+    return {
+        "anomalies": anomaly_detector.recent(since_id, limit, dimension),
+        "detector": anomaly_detector.stats(),
+    }
+
+@app.get("/api/system/ingest")
+async def get_ingest_stats():
+    """Group-commit queue depth and batch sizes for POST /api/calls"""
+    if group_writer:
+        return group_writer.stats()
+    return {"enabled": False}
+
+@app.get("/api/system/stream")
+async def get_stream_stats():
+    """Live metrics stream subscribers and event counts"""
+    return metrics_publisher.stats()
+
+def _scrape_database():
+    with get_db("scrape") as conn:
+        for table in ("calls", "calls_hourly", "agents"):
+            db_rows.set(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], table=table)
+    for file, suffix in (("database", ""), ("wal", "-wal")):
+        path = DB_NAME + suffix
+        db_file_bytes.set(os.path.getsize(path) if os.path.exists(path) else 0, file=file)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of request, query, pool, cache and ingest metrics"""
+    await run_db(_scrape_database)
+    pool = db_pool.stats()
+    db_pool_connections.set(pool["in_use"], state="in_use")
+    db_pool_connections.set(pool["idle"], state="idle")
+    db_pool_waits.set(pool["waits"])
+    db_jobs_gauge.set(db_jobs["queued"], state="queued")
+    db_jobs_gauge.set(db_jobs["running"], state="running")
+    response_cache_lookups.set(response_cache.hits, result="hit")
+    response_cache_lookups.set(response_cache.misses, result="miss")
+    if group_writer:
+        ingest = group_writer.stats()
+        ingest_queue_depth.set(ingest["queue_depth"])
+        ingest_batches.set(ingest["batches"])
+    stream_subscribers.set(metrics_publisher.stats()["subscribers"])
+    if analytics_replica.age() is not None:
+        replica_age_seconds.set(round(analytics_replica.age(), 3))
+    return Response(content=telemetry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/api/system/pool")
+async def get_pool_stats():
+    """Connection pool size, checkout latency and wait time"""
+    return {
+        **db_pool.stats(),
+        "max_concurrency": DB_MAX_CONCURRENCY,
+        "jobs_queued": db_jobs["queued"],
+        "jobs_running": db_jobs["running"],
+        "jobs_completed": db_jobs["completed"],
+    }
+
+@app.get("/api/system/replica")
+async def get_replica_stats():
+    """Analytics replica refreshes, copy time, staleness and pool state"""
+    return analytics_replica.stats()
+
+@app.get("/api/system/cache")
+async def get_cache_stats():
+    """Response cache hit/miss counts"""
+    return response_cache.stats()
+
+def _maintenance_status():
+    with get_db("maintenance_status") as conn:
+        horizon = _raw_horizon(conn)
+        runs = conn.execute('''
+            SELECT report FROM maintenance_runs
+            WHERE report IS NOT NULL
+            ORDER BY run_id DESC LIMIT 10
+        ''').fetchall()
+    return {
+        "retention_days": RETENTION_DAYS,
+        "interval_seconds": MAINTENANCE_INTERVAL,
+        "raw_horizon": _from_epoch(horizon) if horizon else None,
+        "running": maintenance_lock.locked(),
+        "runs": [json.loads(row[0]) for row in runs],
+    }
+
+@app.get("/api/system/maintenance")
+async def get_maintenance_status():
+    """Retention settings, the raw data horizon and the latest maintenance reports"""
+    return await run_db(_maintenance_status)
+
+@app.post("/api/system/maintenance")
+async def run_maintenance_now():
+    """Run the retention and compaction job now and return its report"""
+    report = await asyncio.to_thread(run_maintenance)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Maintenance is already running")
+    return report
+
+def _list_agents(start=None, end=None):
+    with get_db("agents", replica=True) as conn:
+        rows = conn.execute('''
+            SELECT agent_key, agent_id, first_seen, last_seen, call_count
+            FROM agents
+            WHERE call_count > 0
+            ORDER BY agent_id
+        ''').fetchall()
+        active = None
+        if start is not None:
+            first_hour, last_hour = _whole_hours(start, end)
+            active = {row[0] for row in conn.execute('''
+                SELECT agent_key FROM calls_hourly
+                WHERE hour >= :first_hour AND hour < :last_hour
+                UNION
+                SELECT agent_key FROM calls
+                WHERE (start_time >= :start AND start_time < :first_hour)
+                   OR (start_time >= :last_hour AND start_time <= :end)
+            ''', {"start": start, "end": end, "first_hour": first_hour, "last_hour": last_hour})}
+    
+    agents = []
+    for row in rows:
+        agent = {
+            "agent_id": row['agent_id'],
+            "first_seen": _from_epoch(row['first_seen']),
+            "last_seen": _from_epoch(row['last_seen']),
+            "call_count": row['call_count'],
+        }
+        if active is not None:
+            agent["active_in_window"] = row['agent_key'] in active
+        agents.append(agent)
+    return agents
 
 @app.get("/api/agents")
-async def get_agents():
-    """Get list of all agents"""
-    with get_db() as conn:
-        cursor = conn.execute("SELECT DISTINCT agent_id FROM calls ORDER BY agent_id")
-        return [{"agent_id": row['agent_id']} for row in cursor.fetchall()]
+async def get_agents(
+    request: Request,
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None)
+):
+    """Get list of all agents with first/last call time and lifetime call count"""
+    if start_date is None and end_date is None:
+        return await cached_json(request, ("agents",), _list_agents)
+    
+    if not end_date:
+        now = time.time()
+        end_date = datetime.fromtimestamp(now - now % -RESPONSE_CACHE_NOW_RESOLUTION)
+    start = _to_epoch_ceil(start_date) if start_date else 0
+    end = _to_epoch(end_date)
+    return await cached_json(request, ("agents", start, end), _list_agents, start, end)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Call Metrics API")
+    parser.add_argument(
+        "command", nargs="?", default="serve", choices=["serve", "rebuild-rollups", "migrate", "maintain"],
+        help="serve the API (default), rebuild the calls_hourly rollup, "
+             "migrate a legacy database to the compact schema, "
+             "or purge expired raw calls and compact the database"
+    )
+    parser.add_argument(
+        "--vacuum", action="store_true",
+        help="with migrate or maintain: VACUUM afterwards to return freed pages to the OS "
+             "(and switch the database to incremental auto-vacuum)"
+    )
+    parser.add_argument(
+        "--retention-days", type=int, default=RETENTION_DAYS,
+        help="with maintain: keep raw calls this many days (default: CALL_METRICS_RETENTION_DAYS)"
+    )
+    args = parser.parse_args()
+    
+    if args.command == "migrate":
+        size_before = os.path.getsize(DB_NAME) if os.path.exists(DB_NAME) else 0
+        init_db()
+        with get_db("migrate") as conn:
+            if args.vacuum:
+                conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"{DB_NAME}: {size_before:,} bytes -> {os.path.getsize(DB_NAME):,} bytes")
+    elif args.command == "maintain":
+        init_db()
+        with get_db("maintenance") as conn:
+            report = maintain(conn, retention_days=args.retention_days)
+            if args.vacuum:
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(json.dumps(report, indent=2))
+        if args.vacuum:
+            print(f"{DB_NAME}: {os.path.getsize(DB_NAME):,} bytes after VACUUM")
+    elif args.command == "rebuild-rollups":
+        init_db()
+        with get_db("rebuild_rollups") as conn:
+            print(f"Rebuilt calls_hourly: {rebuild_rollups(conn)} rollup rows")
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
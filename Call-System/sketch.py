@@ -0,0 +1,139 @@
+# sketch.py
+"""Mergeable quantile sketch for call durations.
+
+A DDSketch-style histogram: durations fall into logarithmic buckets whose
+width grows with the value, so any quantile is answered within RELATIVE_ACCURACY
+of the true value. Bucket counts are packed into fixed-width fields of one
+Python integer, which makes merging two sketches a single integer addition;
+serialized sketches list only the non-empty (bucket, count) pairs.
+"""
+import math
+import struct
+import sys
+from array import array
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Bucket 0 holds durations below one second; the last bucket absorbs
+# anything longer than about four days
+MAX_BUCKET = 400
+FIELD_BITS = 32
+
+# Serialized form: little-endian (uint16 bucket index, uint32 count) pairs
+_PAIR = struct.Struct("<HI")
+
+PERCENTILES = {"p50": 0.50, "p90": 0.90, "p95": 0.95, "p99": 0.99}
+
+
+def bucket_index(value):
+    if value < 1:
+        return 0
+    return min(MAX_BUCKET, 1 + math.ceil(math.log(value) / LOG_GAMMA))
+
+
+def bucket_value(index):
+    """Representative value of a bucket (within RELATIVE_ACCURACY of its members)"""
+    if index == 0:
+        return 0.0
+    return 2 * GAMMA ** (index - 1) / (GAMMA + 1)
+
+
+class DurationSketch:
+    """Counts of durations per logarithmic bucket, packed into one integer"""
+
+    __slots__ = ("packed",)
+
+    def __init__(self, packed=0):
+        self.packed = packed
+
+    @classmethod
+    def from_bytes(cls, data):
+        packed = 0
+        if data:
+            for index, count in _PAIR.iter_unpack(data):
+                packed += count << (index * FIELD_BITS)
+        return cls(packed)
+
+    @classmethod
+    def merged(cls, parts):
+        """Merge of many serialized sketches, decoded in one pass over their bytes"""
+        counts = [0] * (MAX_BUCKET + 1)
+        for index, count in _PAIR.iter_unpack(b"".join(parts)):
+            counts[index] += count
+        fields = array("I", counts)
+        if sys.byteorder == "big":
+            fields.byteswap()
+        return cls(int.from_bytes(fields.tobytes(), "little"))
+
+    def to_bytes(self):
+        return _encode(self.counts())
+
+    def merge(self, other):
+        self.packed += other.packed
+        return self
+
+    def counts(self):
+        """Non-empty (bucket index, count) pairs in ascending order"""
+        fields = -(-self.packed.bit_length() // FIELD_BITS)
+        counts = array("I", self.packed.to_bytes(fields * 4, "little"))
+        if sys.byteorder == "big":
+            counts.byteswap()
+        return [(index, count) for index, count in enumerate(counts) if count]
+
+    def quantiles(self, quantiles=PERCENTILES):
+        """Map each name in quantiles to its estimated value (empty if no data)"""
+        buckets = self.counts()
+        total = sum(count for _, count in buckets)
+        if not total:
+            return {}
+
+        result = {}
+        for name, q in sorted(quantiles.items(), key=lambda item: item[1]):
+            rank = q * (total - 1)
+            seen = 0
+            for index, count in buckets:
+                seen += count
+                if seen > rank:
+                    result[name] = round(bucket_value(index), 1)
+                    break
+        return result
+
+
+class _SketchAggregate:
+    """SQLite aggregate: sketch_agg(duration) -> serialized sketch"""
+
+    def __init__(self):
+        self.counts = {}
+
+    def step(self, value):
+        if value is not None:
+            index = bucket_index(value)
+            self.counts[index] = self.counts.get(index, 0) + 1
+
+    def finalize(self):
+        return _encode(self.counts.items())
+
+
+def _encode(pairs):
+    return b"".join(_PAIR.pack(index, count) for index, count in pairs)
+
+
+def serialize_values(values):
+    """Serialized sketch of values, without building a DurationSketch"""
+    counts = {}
+    for value in values:
+        index = bucket_index(value)
+        counts[index] = counts.get(index, 0) + 1
+    return _encode(counts.items())
+
+
+def _merge_sketches(left, right):
+    return DurationSketch.from_bytes(left).merge(DurationSketch.from_bytes(right)).to_bytes()
+
+
+def register_sketch_functions(conn):
+    """Make sketch_agg() and sketch_merge() available to SQL on conn"""
+    conn.create_aggregate("sketch_agg", 1, _SketchAggregate)
+    conn.create_function("sketch_merge", 2, _merge_sketches, deterministic=True)
@@ -0,0 +1,40 @@
+# conftest.py - a scratch Call Metrics database shared by the tests
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "call_metrics_test.db")
+os.environ["CALL_METRICS_DB"] = DB_PATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+def http_scope(path, query_string=b""):
+    """ASGI scope of a plain GET, for driving main.app without a client"""
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path,
+        "raw_path": path.encode(), "query_string": query_string, "root_path": "",
+        "headers": [(b"host", b"testserver")], "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    main.init_db()
+    yield DB_PATH
+    main.db_pool.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    """The API with its lifespan running"""
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,119 @@
+# test_concurrency.py - the concurrency engine against a per-second brute force
+#
+# Usage (from the Call-System directory):
+#   python -m pytest tests
+import functools
+import random
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import main
+
+# US clocks go forward at 2024-03-10 07:00 UTC, inside the window
+DATA_START = int(datetime(2024, 3, 8, tzinfo=timezone.utc).timestamp())
+DATA_END = int(datetime(2024, 3, 12, tzinfo=timezone.utc).timestamp())
+WINDOW = (
+    datetime(2024, 3, 9, 5, 17, 23, tzinfo=timezone.utc),
+    datetime(2024, 3, 11, 3, 2, 11, tzinfo=timezone.utc),
+)
+
+
+def random_calls(seed=19, agents=6, count=4000):
+    """Calls with durations from seconds to hours, so agents overlap themselves
+    and some calls straddle the window edges"""
+    rng = random.Random(seed)
+    calls = []
+    for _ in range(count):
+        start = rng.randrange(DATA_START, DATA_END)
+        duration = rng.choice([rng.randint(1, 60), rng.randint(60, 1800), rng.randint(1800, 14400)])
+        calls.append((f"agent_{rng.randrange(agents)}", f"cust_{rng.randrange(500)}",
+                      start, start + duration, rng.choice(["completed", "dropped", "voicemail"])))
+    return calls
+
+
+@pytest.fixture(scope="module")
+def conn():
+    with main.get_db() as conn:
+        main.clear_calls(conn)
+        main.load_calls(conn, [random_calls()])
+        yield conn
+
+
+def occupancy(calls, start, stop):
+    """Calls in progress at every second of [start, stop), counting each call
+    from its start_time up to, not including, its end_time"""
+    changes = [0] * (stop - start + 1)
+    for call_start, call_end in calls:
+        call_start, call_end = max(call_start, start), min(call_end, stop)
+        if call_start < call_end:
+            changes[call_start - start] += 1
+            changes[call_end - start] -= 1
+    counts, current = [], 0
+    for change in changes[:-1]:
+        current += change
+        counts.append(current)
+    return counts
+
+
+@functools.lru_cache(maxsize=None)
+def brute_force(start, stop):
+    """Per-second counts over the window, overall and for each agent"""
+    calls = random_calls()
+    agents = {
+        agent_id: occupancy([(call[2], call[3]) for call in calls if call[0] == agent_id], start, stop)
+        for agent_id in sorted({call[0] for call in calls})
+    }
+    return occupancy([(call[2], call[3]) for call in calls], start, stop), agents
+
+
+@functools.lru_cache(maxsize=None)
+def label(ts, bucket, zone):
+    local = datetime.fromtimestamp(ts, zone)
+    if bucket == "1d":
+        return local.strftime("%Y-%m-%d 00:00:00")
+    minutes = main.METRICS_BUCKETS[bucket] // 60
+    return local.strftime(f"%Y-%m-%d %H:{local.minute - local.minute % minutes:02d}:00")
+
+
+def timeline(counts, labels, sparse):
+    seconds = {}
+    for count, name in zip(counts, labels):
+        seconds.setdefault(name, []).append(count)
+    return [
+        {"hour": name, "peak": max(values), "average": round(sum(values) / len(values), 3)}
+        for name, values in seconds.items()
+        if max(values) or not sparse
+    ]
+
+
+@pytest.mark.parametrize("zone", [None, "Asia/Kolkata", "America/New_York"])
+@pytest.mark.parametrize("bucket", ["5m", "15m", "1h", "1d"])
+def test_matches_brute_force(conn, bucket, zone):
+    zone = ZoneInfo(zone) if zone else None
+    start_date, end_date = WINDOW
+    start, stop = int(start_date.timestamp()), int(end_date.timestamp()) + 1
+    result = main.compute_concurrency(conn, start_date, end_date, bucket, zone)
+
+    counts, agents = brute_force(start, stop)
+    # Every UTC offset is a whole number of minutes, so seconds share their minute's label
+    labels = [label(ts - ts % 60, bucket, zone) for ts in range(start, stop)]
+    peak = max(counts)
+    assert result.peak_concurrent == peak
+    assert result.peak_time == datetime.fromtimestamp(start + counts.index(peak), timezone.utc)
+    assert result.average_concurrent == round(sum(counts) / len(counts), 3)
+    assert result.timeline == timeline(counts, labels, sparse=False)
+
+    expected = {
+        agent_id: {
+            "agent_id": agent_id,
+            "peak_concurrent": max(agent_counts),
+            "average_concurrent": round(sum(agent_counts) / len(agent_counts), 3),
+            "timeline": timeline(agent_counts, labels, sparse=True),
+        }
+        for agent_id, agent_counts in agents.items()
+    }
+    assert {row["agent_id"]: row for row in result.agents} == expected
+    ranks = [(row["peak_concurrent"], row["average_concurrent"]) for row in result.agents]
+    assert ranks == sorted(ranks, reverse=True)
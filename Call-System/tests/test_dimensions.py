@@ -0,0 +1,42 @@
+# test_dimensions.py - agent keys are only shared once the insert that made them commits
+from datetime import datetime
+
+import pytest
+
+import main
+
+
+def record(agent_id):
+    return main.CallRecord(agent_id=agent_id, customer_id="cust_1", call_outcome="completed",
+                           start_time=datetime(2024, 1, 1, 9), end_time=datetime(2024, 1, 1, 9, 5))
+
+
+def test_rolled_back_keys_are_never_shared(database):
+    with main.get_db() as conn, main.get_db():
+        # Opens a second pooled connection now, while nothing holds the write lock
+        main.clear_calls(conn)
+
+    with pytest.raises(RuntimeError):
+        with main.get_db() as writer:
+            main._insert_calls(writer, [record("agent_rolled_back")])
+            with main.get_db() as reader:
+                # Not committed, so not visible to other connections
+                assert main.agent_dim.find(reader, "agent_rolled_back") is None
+            raise RuntimeError("abandon the write")
+
+    with main.get_db() as conn:
+        assert main.agent_dim.find(conn, "agent_rolled_back") is None
+        main._insert_calls(conn, [record("agent_newcomer")])
+        conn.commit()
+    with main.get_db() as conn:
+        main._insert_calls(conn, [record("agent_rolled_back")])
+        conn.commit()
+
+    with main.get_db() as conn:
+        orphans = conn.execute(
+            "SELECT COUNT(*) FROM calls WHERE agent_key NOT IN (SELECT agent_key FROM agents)"
+        ).fetchone()[0]
+        agent_ids = [row["agent_id"] for row in conn.execute(main.CALL_SELECT + " ORDER BY c.call_id")]
+        assert main.agent_dim.find(conn, "agent_rolled_back") is not None
+    assert orphans == 0
+    assert agent_ids == ["agent_newcomer", "agent_rolled_back"]
@@ -0,0 +1,91 @@
+# test_export.py - export slots are held only while an export is being sent
+import asyncio
+import json
+
+import pytest
+
+import main
+from conftest import http_scope
+
+
+def free_slots():
+    taken = 0
+    while main.export_slots.acquire(blocking=False):
+        taken += 1
+    for _ in range(taken):
+        main.export_slots.release()
+    return taken
+
+
+async def export(started, query_string=b""):
+    """Request an export over ASGI with a client that never reads the body"""
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            started.append(message["status"])
+        await asyncio.Event().wait()
+
+    await main.app(http_scope("/api/calls/export", query_string), receive, send)
+
+
+@pytest.fixture
+def calls(client):
+    with main.get_db() as conn:
+        main.clear_calls(conn)
+        main.load_calls(conn, [[
+            (f"agent_{i % 3}", f"cust_{i}", 1_700_000_000 + i * 60, 1_700_000_030 + i * 60, "completed")
+            for i in range(50)
+        ]])
+
+
+def test_cancelled_exports_release_their_slots(client, calls):
+    async def cancel_after(steps):
+        started = []
+        task = asyncio.create_task(export(started))
+        for _ in range(steps):
+            await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return started
+
+    # From before the handler runs to after the response has started, but
+    # before the first chunk is sent
+    statuses = [client.portal.call(cancel_after, steps) for steps in range(40)]
+    assert 200 in statuses[-1]
+    assert free_slots() == main.EXPORT_MAX_CONCURRENT
+
+
+def test_exports_beyond_the_cap_get_503(client, calls):
+    async def saturate():
+        started = []
+        tasks = [asyncio.create_task(export(started)) for _ in range(main.EXPORT_MAX_CONCURRENT)]
+        while len(started) < main.EXPORT_MAX_CONCURRENT:
+            await asyncio.sleep(0.01)
+        response = await asyncio.to_thread(client.get, "/api/calls/export")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return started, response
+
+    started, response = client.portal.call(saturate)
+    assert started == [200] * main.EXPORT_MAX_CONCURRENT
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "10"
+    assert free_slots() == main.EXPORT_MAX_CONCURRENT
+    assert client.get("/api/calls/export").text.count("\n") == 51
+
+
+def test_export_filters_by_several_agents(client, calls):
+    rows = client.get("/api/calls/export", params={"format": "ndjson", "agent_id": ["agent_0", "agent_2"]})
+    agents = [json.loads(line)["agent_id"] for line in rows.text.splitlines()]
+    assert len(agents) == 33 and set(agents) == {"agent_0", "agent_2"}
+    one = client.get("/api/calls/export", params={"format": "ndjson", "agent_id": "agent_1"})
+    assert len(one.text.splitlines()) == 17
@@ -0,0 +1,50 @@
+# test_replica.py - reads keep working while replica refreshes retire old copies
+import os
+
+import pytest
+
+import main
+
+
+def add_call(conn, i):
+    main.load_calls(conn, [[(f"agent_{i % 4}", f"cust_{i}", 1_700_000_000 + i, 1_700_000_060 + i, "completed")]])
+
+
+@pytest.fixture
+def replica(database, monkeypatch):
+    replica = main.AnalyticsReplica(database, os.path.splitext(database)[0] + "_replica.db", interval=1)
+    monkeypatch.setattr(main, "analytics_replica", replica)
+    with main.get_db() as conn:
+        main.clear_calls(conn)
+        add_call(conn, 0)
+    replica.refresh()
+    yield replica
+    replica.close()
+
+
+class StaleRead:
+    """Hands out `stale` on the first read of .pool, as if a refresh landed just after it"""
+
+    def __init__(self, replica, stale):
+        self.replica = replica
+        self.stale = stale
+
+    @property
+    def pool(self):
+        stale, self.stale = self.stale, None
+        return stale or self.replica.pool
+
+
+def test_retired_pool_is_not_reopened(replica, monkeypatch):
+    stale = replica.pool
+    with main.get_db() as conn:
+        add_call(conn, 1)
+    assert replica.refresh()
+    assert stale.drained and not os.path.exists(stale.database[len("file:"):].split("?")[0])
+    with pytest.raises(main.PoolRetired):
+        stale.acquire()
+
+    monkeypatch.setattr(main, "analytics_replica", StaleRead(replica, stale))
+    with main.get_db(replica=True) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0] == 2
+
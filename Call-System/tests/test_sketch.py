@@ -0,0 +1,16 @@
+# test_sketch.py - decoding many sketches at once matches merging them one by one
+import random
+
+from sketch import DurationSketch, serialize_values
+
+
+def test_merged_matches_pairwise_merge():
+    rng = random.Random(10)
+    parts = [serialize_values(rng.randint(0, 20000) for _ in range(rng.randint(0, 30))) for _ in range(500)]
+    expected = DurationSketch()
+    for part in parts:
+        expected.merge(DurationSketch.from_bytes(part))
+    merged = DurationSketch.merged(parts)
+    assert merged.packed == expected.packed
+    assert merged.quantiles() == expected.quantiles()
+    assert DurationSketch.merged([]).quantiles() == {}
@@ -0,0 +1,51 @@
+# test_stream.py - calls pushed on /api/stream/metrics look like GET /api/calls rows
+import asyncio
+import json
+
+import main
+from conftest import http_scope
+
+
+async def next_event(chunks, name):
+    while True:
+        chunk = await asyncio.wait_for(chunks.get(), 10)
+        fields = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if ": " in line)
+        if fields.get("event") == name:
+            return json.loads(fields["data"])
+
+
+def test_streamed_calls_match_the_list_endpoint(client):
+    call = {
+        "agent_id": "agent_stream", "customer_id": "cust_stream", "call_outcome": "completed",
+        "start_time": "2024-03-15T14:30:00+01:00", "end_time": "2024-03-15T14:42:05+01:00",
+    }
+
+    async def subscribe_and_post():
+        chunks = asyncio.Queue()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                await chunks.put(message["body"])
+
+        stream = asyncio.create_task(main.app(http_scope("/api/stream/metrics"), receive, send))
+        try:
+            await next_event(chunks, "hello")
+            created = await asyncio.to_thread(client.post, "/api/calls", json=call)
+            return created.json(), await next_event(chunks, "calls")
+        finally:
+            stream.cancel()
+            await asyncio.gather(stream, return_exceptions=True)
+
+    created, event = client.portal.call(subscribe_and_post)
+    listed = client.get("/api/calls", params={"agent_id": "agent_stream"}).json()["calls"]
+    streamed = [row for row in event["calls"] if row["call_id"] == created["call_id"]]
+    assert streamed == [row for row in listed if row["call_id"] == created["call_id"]]
+    assert streamed[0]["duration"] == 725
@@ -1,7 +1,7 @@
 # demo_mode.py
 import json
-import sqlite3
 import os
+import sys
 from datetime import datetime, timedelta
 import random
 import streamlit as st
@@ -96,12 +96,11 @@ class DemoModeManager:
             if os.path.exists(path):
                 os.remove(path)
         
-        # Clear call database
+        # Clear call database, rollups and agent statistics included
         if os.path.exists(self.call_db_path):
-            conn = sqlite3.connect(self.call_db_path)
-            conn.execute("DELETE FROM calls")
-            conn.commit()
-            conn.close()
+            call_api = self._call_api()
+            with call_api.get_db() as conn:
+                call_api.clear_calls(conn)
         
         # Clear CRM data
         contacts_path = os.path.join(self.crm_data_path, "contacts.json")
@@ -134,45 +133,37 @@ class DemoModeManager:
         with open(os.path.join(self.email_path, "email_responses.json"), 'w') as f:
             json.dump(responses, f, indent=2)
     
+    def _call_api(self):
+        """The Call Metrics API module, bound to the demo database (creating or
+        migrating its schema)"""
+        call_system_dir = os.path.abspath("Call-System")
+        if call_system_dir not in sys.path:
+            sys.path.insert(0, call_system_dir)
+        from benchmarks.common import import_call_api
+        call_api = import_call_api(self.call_db_path)
+        call_api.init_db()
+        return call_api
+    
     def _populate_calls(self):
         """Populate call system with demo calls"""
-        conn = sqlite3.connect(self.call_db_path)
-        
-        # Create table if not exists
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS calls (
-                call_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                agent_id TEXT NOT NULL,
-                customer_id TEXT NOT NULL,
-                start_time TIMESTAMP NOT NULL,
-                end_time TIMESTAMP NOT NULL,
-                duration INTEGER NOT NULL,
-                call_outcome TEXT NOT NULL
-            )
-        ''')
-        
         agents = ['AGT_SMITH', 'AGT_JONES', 'AGT_DAVIS']
+        calls = []
         
         for idx, scenario in enumerate(self.demo_scenarios):
             customer = self.demo_customers[scenario["customer_id"]]
-            start_time = datetime.now() - timedelta(hours=idx*3)
-            duration = scenario["call_duration"]
-            end_time = start_time + timedelta(seconds=duration)
-            
-            conn.execute('''
-                INSERT INTO calls (agent_id, customer_id, start_time, end_time, duration, call_outcome)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
+            start_time = int(time.time()) - idx * 3 * 3600
+            calls.append((
                 agents[idx % len(agents)],
                 customer["id"],
-                start_time.isoformat(),
-                end_time.isoformat(),
-                duration,
+                start_time,
+                start_time + scenario["call_duration"],
                 scenario["call_outcome"]
             ))
         
-        conn.commit()
-        conn.close()
+        # Inserted like any other call, so rollups and agent stats stay in step
+        call_api = self._call_api()
+        with call_api.get_db() as conn:
+            call_api.load_calls(conn, [calls])
     
     def _populate_crm(self):
         """Populate CRM with demo contacts"""
@@ -1,7 +1,7 @@
 # reset_demo.py
 import os
 import shutil
-import sqlite3
+import sys
 import json
 from datetime import datetime, timedelta
 import random
@@ -55,24 +55,17 @@ def reset_call_metrics():
     
     db_path = os.path.join('Call-System', 'call_metrics.db')
     if os.path.exists(db_path):
-        os.remove(db_path)
+        # The WAL and shared-memory files belong to the old database too
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
         print("  ✅ Removed old database")
     
-    # Create new database with demo data
-    conn = sqlite3.connect(db_path)
-    
-    # Create table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS calls (
-            call_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_id TEXT NOT NULL,
-            customer_id TEXT NOT NULL,
-            start_time TIMESTAMP NOT NULL,
-            end_time TIMESTAMP NOT NULL,
-            duration INTEGER NOT NULL,
-            call_outcome TEXT NOT NULL
-        )
-    ''')
+    # Create new database with the Call API's schema
+    sys.path.insert(0, os.path.abspath('Call-System'))
+    from benchmarks.common import import_call_api
+    call_api = import_call_api(db_path)
+    call_api.init_db()
     
     # Generate demo data for today
     agents = ['AGT001', 'AGT002', 'AGT003', 'AGT004', 'AGT005']
@@ -82,25 +75,23 @@ def reset_call_metrics():
     today_start = now.replace(hour=9, minute=0, second=0)
     
     # Add some calls for today
+    calls = []
     for i in range(15):
-        start_time = today_start + timedelta(minutes=random.randint(0, 480))
+        start_time = int((today_start + timedelta(minutes=random.randint(0, 480))).timestamp())
         duration = random.randint(120, 900)  # 2-15 minutes
-        end_time = start_time + timedelta(seconds=duration)
         
-        conn.execute('''
-            INSERT INTO calls (agent_id, customer_id, start_time, end_time, duration, call_outcome)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+        calls.append((
             random.choice(agents),
             f"CUST{random.randint(1000, 9999)}",
-            start_time.isoformat(),
-            end_time.isoformat(),
-            duration,
+            start_time,
+            start_time + duration,
             random.choice(outcomes)
         ))
     
-    conn.commit()
-    conn.close()
+    # Rollups and agent statistics are maintained as the calls are loaded
+    with call_api.get_db() as conn:
+        call_api.load_calls(conn, [calls])
+    call_api.db_pool.close()
     print("  ✅ Created demo call data")
 
 def reset_crm_integration():
@@ -89,13 +89,27 @@ class UnifiedSearchEngine:
             conn = sqlite3.connect(self.call_db_path)
             conn.row_factory = sqlite3.Row
             
-            # Search by customer ID, agent ID, or phone number
+            # Exact customer ID or agent ID match, served by the
+            # (customer_id, start_time) and agent_key indexes
             cursor = conn.execute("""
-                SELECT * FROM calls 
-                WHERE customer_id LIKE ? OR agent_id LIKE ?
-                ORDER BY start_time DESC
+                SELECT * FROM (
+                    SELECT c.call_id, c.start_time AS started FROM calls c
+                    WHERE c.customer_id = ?
+                    ORDER BY c.start_time DESC LIMIT 20
+                ) UNION SELECT * FROM (
+                    SELECT c.call_id, c.start_time AS started FROM calls c
+                    WHERE c.agent_key = (SELECT agent_key FROM agents WHERE agent_id = ?)
+                    ORDER BY c.start_time DESC LIMIT 20
+                )
+                ORDER BY started DESC
                 LIMIT 20
-            """, (f"%{query}%", f"%{query}%"))
+            """, (query, query))
+            call_ids = [row["call_id"] for row in cursor]
+            cursor = conn.execute(f"""
+                SELECT * FROM calls_view
+                WHERE call_id IN ({",".join("?" * len(call_ids))})
+                ORDER BY start_time DESC
+            """, call_ids)
             
             for row in cursor:
                 results.append({